@@ -0,0 +1,146 @@
+"""
+Pinning the workers of a pool to CPUs, so that they don't migrate between
+cores (or between SMT siblings of a core) while the benchmark runs.
+
+The policies, each an order in which the workers take CPUs, wrapping around
+if there are more workers than CPUs:
+
+  - none: leave placement to the OS scheduler.
+  - compact: fill each physical core's SMT siblings before the next core.
+  - scatter: one CPU per physical core, spreading across NUMA nodes and
+    sockets, and only then the second SMT sibling of each core.
+  - physical: one CPU per physical core, never the SMT siblings, so extra
+    workers share a core's first CPU rather than use its sibling.
+
+Only the CPUs this process may run on are used. Each worker pins itself, with
+`os.sched_setaffinity(0, ...)`, which on Linux applies only to the calling
+thread. So the same task pins a subprocess worker, a worker thread, or the
+native thread behind a subinterpreter worker.
+"""
+
+import glob
+import os
+import tempfile
+import time
+
+from startup import wait_for_workers
+
+POLICIES = ["none", "compact", "scatter", "physical"]
+
+
+def parse_cpulist(text):
+    """Parses a sysfs CPU list, e.g. "0-3,8-11"."""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def read_int(path, default=0):
+    try:
+        with open(path) as fd:
+            return int(fd.read())
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def read_topology(cpus):
+    """Returns the (NUMA node, socket, core) of each of `cpus`."""
+    nodes = {}
+    for path in glob.glob("/sys/devices/system/node/node*/cpulist"):
+        node = int(os.path.basename(os.path.dirname(path))[4:])
+        with open(path) as fd:
+            for cpu in parse_cpulist(fd.read()):
+                nodes[cpu] = node
+
+    topology = {}
+    for cpu in cpus:
+        path = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+        topology[cpu] = (
+            nodes.get(cpu, 0),
+            read_int(f"{path}/physical_package_id"),
+            # Without the topology, treat each CPU as its own core
+            read_int(f"{path}/core_id", cpu),
+        )
+    return topology
+
+
+def cpu_order(policy, cpus=None):
+    """Returns the CPUs that the workers take in turn under `policy`."""
+    if cpus is None:
+        cpus = sorted(os.sched_getaffinity(0))
+    topology = read_topology(cpus)
+    cores = {}
+    for cpu in cpus:
+        cores.setdefault(topology[cpu], []).append(cpu)
+
+    if policy == "compact":
+        return [cpu for core in sorted(cores) for cpu in cores[core]]
+    elif policy == "physical":
+        return [cores[core][0] for core in sorted(cores)]
+    elif policy == "scatter":
+        # Deal the cores out round-robin across (node, socket), one SMT
+        # sibling at a time
+        domains = {}
+        for core in sorted(cores):
+            domains.setdefault(core[:2], []).append(cores[core])
+        order = []
+        for sibling in range(max(len(x) for x in cores.values())):
+            for i in range(max(len(x) for x in domains.values())):
+                for domain in sorted(domains):
+                    if i < len(domains[domain]) and sibling < len(domains[domain][i]):
+                        order.append(domains[domain][i][sibling])
+        return order
+    raise ValueError(f"Unknown pinning policy {policy!r}")
+
+
+def claim_slot(directory):
+    """
+    Returns the lowest slot number not yet claimed by another worker. Creating
+    the slot's file with O_EXCL is atomic across threads, processes and
+    interpreters alike.
+    """
+    slot = 0
+    while True:
+        try:
+            fd = os.open(
+                os.path.join(directory, f"slot-{slot}"),
+                os.O_CREAT | os.O_EXCL | os.O_WRONLY,
+            )
+        except FileExistsError:
+            slot += 1
+            continue
+        os.close(fd)
+        return slot
+
+
+def pin(args):
+    """
+    A task that pins the worker running it to the CPU for its slot. Like
+    `startup.ready`, it blocks until `nworkers` of them are running at once,
+    so that every worker runs exactly one.
+
+    Returns the slot and the CPU.
+    """
+    directory, nworkers, cpus = args
+    arrived = time.perf_counter()
+    slot = claim_slot(directory)
+    cpu = cpus[slot % len(cpus)]
+    # On Linux, pid 0 is the calling thread, not the whole process
+    os.sched_setaffinity(0, {cpu})
+    wait_for_workers(directory, nworkers, arrived)
+    return slot, cpu
+
+
+def pin_workers(pool, nworkers, policy):
+    """
+    Pins each of the `nworkers` workers of `pool` to a CPU under `policy`,
+    and returns the CPUs, in slot order.
+    """
+    cpus = cpu_order(policy)
+    with tempfile.TemporaryDirectory() as directory:
+        pinned = pool.map(pin, [(directory, nworkers, cpus)] * nworkers, 1)
+    return [cpu for slot, cpu in sorted(pinned)]
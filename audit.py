@@ -0,0 +1,361 @@
+"""
+An auditor for shared mutable state in threaded runs, to find what would
+contend on a free-threaded interpreter (like nbody's module-level `SYSTEM`,
+mutated by every thread) without reading the benchmark by hand.
+
+While the pool's threads run, a `threading.settrace` line tracer watches the
+code of the benchmark module and the local modules it imports. The
+accesses on each line are found from its source:
+
+  - writes: assigning or deleting an attribute or item of a name
+    (`v[0] -= ...`, `self.x += 1`), calling a mutating method on it
+    (`result.append(...)`), and assigning a global name.
+  - reads: reading an attribute or item of a name, iterating over a name, and
+    reading a global name.
+
+Before the line runs, each name is looked up in the frame, so the accesses
+are attributed to the objects themselves, whichever names they are reached
+by. Each thread logs the objects it accessed, with the source locations, and
+the logs are merged at the end. An object is reported if it was written by
+more than one thread, or read by one thread while another wrote it. Objects
+that were only read, but by many threads, are listed too, since on a
+free-threaded interpreter their reference counts are contended.
+
+The accesses are found per source line, so this is a heuristic: writes
+through expressions other than a plain name (`a.b.c = 1`, `f()[0] = 1`) are
+attributed to the name at their base or missed, and mutations inside C code
+(e.g. `copy.deepcopy`, `list.sort` called through another name) are not
+seen. Tracing slows the run down by orders of magnitude, so audit small
+runs (e.g. with `--count` and `--size`).
+"""
+
+import ast
+import os
+import sys
+import symtable
+import threading
+
+# Methods of the built-in containers that mutate them
+MUTATORS = {
+    "add",
+    "append",
+    "appendleft",
+    "clear",
+    "discard",
+    "extend",
+    "extendleft",
+    "insert",
+    "pop",
+    "popitem",
+    "popleft",
+    "remove",
+    "reverse",
+    "setdefault",
+    "sort",
+    "update",
+}
+
+# Prune the objects that only this thread's log keeps alive every this many
+# recorded lines, so that short-lived objects don't pile up
+PRUNE_INTERVAL = 100_000
+
+# The number of objects only read, but by several threads, to report
+SHARED_READS_LIMIT = 10
+
+
+def local_sources(path, seen=None):
+    """
+    Returns the absolute path of the module at `path`, and of the modules in
+    its directory that it imports, transitively.
+    """
+    if seen is None:
+        seen = set()
+    path = os.path.abspath(path)
+    if not os.path.exists(path) or path in seen:
+        return seen
+    seen.add(path)
+    with open(path) as fd:
+        tree = ast.parse(fd.read(), path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            local_sources(
+                os.path.join(os.path.dirname(path), f"{name.split('.')[0]}.py"), seen
+            )
+    return seen
+
+
+def is_global(table, name):
+    try:
+        return table.lookup(name).is_global()
+    except KeyError:
+        # e.g. a name that is only used inside a comprehension
+        return False
+
+
+def own_nodes(stmt):
+    """
+    Returns the parts of `stmt` that run on its own line: all of a simple
+    statement, but only the header of a compound one, whose body is made of
+    statements of its own.
+    """
+    if isinstance(stmt, (ast.For, ast.AsyncFor)):
+        return [stmt.target, stmt.iter]
+    elif isinstance(stmt, (ast.If, ast.While)):
+        return [stmt.test]
+    elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+        return list(stmt.items)
+    elif isinstance(
+        stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Try)
+    ):
+        return []
+    return [stmt]
+
+
+def find_accesses(stmt, table):
+    """
+    Returns the accesses on the line of `stmt`, in the function whose symbol
+    table is `table`, as a list of `(name, label, write, is_global_name)`.
+    """
+    accesses = []
+    if isinstance(stmt, (ast.For, ast.AsyncFor)) and isinstance(stmt.iter, ast.Name):
+        accesses.append((stmt.iter.id, f"iter({stmt.iter.id})", False, False))
+    for node in own_nodes(stmt):
+        for sub in ast.walk(node):
+            if isinstance(sub, ast.Attribute) and isinstance(sub.value, ast.Name):
+                write = isinstance(sub.ctx, (ast.Store, ast.Del))
+                label = f"{sub.value.id}.{sub.attr}"
+                accesses.append((sub.value.id, label, write, False))
+            elif isinstance(sub, ast.Subscript) and isinstance(sub.value, ast.Name):
+                write = isinstance(sub.ctx, (ast.Store, ast.Del))
+                accesses.append((sub.value.id, f"{sub.value.id}[...]", write, False))
+            elif (
+                isinstance(sub, ast.Call)
+                and isinstance(sub.func, ast.Attribute)
+                and isinstance(sub.func.value, ast.Name)
+                and sub.func.attr in MUTATORS
+            ):
+                name = sub.func.value.id
+                accesses.append((name, f"{name}.{sub.func.attr}()", True, False))
+            elif isinstance(sub, ast.Name) and is_global(table, sub.id):
+                write = isinstance(sub.ctx, (ast.Store, ast.Del))
+                accesses.append((sub.id, sub.id, write, True))
+    return accesses
+
+
+def analyze(filename):
+    """Returns the accesses on each line of the functions in `filename`."""
+    with open(filename) as fd:
+        source = fd.read()
+    tree = ast.parse(source, filename)
+    lines = {}
+
+    def visit(body, table):
+        for stmt in body:
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                children = [
+                    child
+                    for child in table.get_children()
+                    if child.get_name() == stmt.name
+                ]
+                # Prefer the scope defined on this line, for redefinitions
+                child = next(
+                    (c for c in children if c.get_lineno() == stmt.lineno),
+                    children[0] if children else None,
+                )
+                if child is not None:
+                    visit(stmt.body, child)
+                continue
+            # Module level code runs once, on import, in the main thread
+            if table.get_type() == "function":
+                accesses = find_accesses(stmt, table)
+                if accesses:
+                    lines.setdefault(stmt.lineno, []).extend(accesses)
+            for field in ("body", "orelse", "finalbody"):
+                visit(getattr(stmt, field, []), table)
+            for handler in getattr(stmt, "handlers", []):
+                visit(handler.body, table)
+
+    visit(tree.body, symtable.symtable(source, filename, "exec"))
+    return lines
+
+
+class Auditor:
+    def __init__(self, files):
+        self.files = {os.path.abspath(f) for f in files}
+        self.lines = {filename: analyze(filename) for filename in self.files}
+        self.local = threading.local()
+        self.logs = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Traces the threads started from now on."""
+        threading.settrace(self.trace_calls)
+
+    def stop(self):
+        threading.settrace(None)
+
+    def trace_calls(self, frame, event, arg):
+        filename = frame.f_code.co_filename
+        lines = self.lines.get(filename)
+        if lines is None:
+            lines = self.lines.get(os.path.abspath(filename))
+            if lines is None:
+                return None
+        frame.f_trace_lines = True
+
+        def trace_lines(frame, event, arg):
+            if event == "line":
+                accesses = lines.get(frame.f_lineno)
+                if accesses:
+                    self.record(frame, accesses)
+            return trace_lines
+
+        return trace_lines
+
+    def thread_log(self):
+        log = getattr(self.local, "log", None)
+        if log is None:
+            log = self.local.log = {"thread": threading.get_ident(), "objects": {}}
+            self.local.recorded = 0
+            with self.lock:
+                self.logs.append(log)
+        return log
+
+    def record(self, frame, accesses):
+        log = self.thread_log()
+        objects = log["objects"]
+        code = frame.f_code
+        f_locals = None
+        for name, label, write, is_global_name in accesses:
+            if is_global_name:
+                module = frame.f_globals.get("__name__")
+                key = ("global", module, name)
+                obj = None
+                description = f"global {module}.{name}"
+            else:
+                if f_locals is None:
+                    f_locals = frame.f_locals
+                if name in f_locals:
+                    obj = f_locals[name]
+                elif name in frame.f_globals:
+                    obj = frame.f_globals[name]
+                else:
+                    continue
+                key = id(obj)
+                description = f"{type(obj).__name__} {name}"
+            entry = objects.get(key)
+            if entry is None:
+                # Holding on to the object keeps its id from being reused
+                entry = objects[key] = [obj, description, {}, {}]
+            location = (
+                os.path.basename(code.co_filename),
+                frame.f_lineno,
+                code.co_name,
+                label,
+            )
+            counts = entry[3] if write else entry[2]
+            counts[location] = counts.get(location, 0) + 1
+
+        self.local.recorded += 1
+        if self.local.recorded % PRUNE_INTERVAL == 0:
+            self.prune(objects)
+
+    def prune(self, objects):
+        # An object that another thread logged is still held by its log, so
+        # only objects no other thread accessed are dropped
+        for key, entry in list(objects.items()):
+            if entry[0] is not None and sys.getrefcount(entry[0]) <= 2:
+                del objects[key]
+
+    def merge(self):
+        """
+        Returns the objects accessed, by key, as a dict with their
+        description, and the reads and writes of each thread, by location.
+        """
+        merged = {}
+        for log in self.logs:
+            for key, (obj, description, reads, writes) in log["objects"].items():
+                entry = merged.setdefault(
+                    key, {"description": description, "reads": {}, "writes": {}}
+                )
+                if reads:
+                    entry["reads"][log["thread"]] = reads
+                if writes:
+                    entry["writes"][log["thread"]] = writes
+        return merged
+
+    def findings(self):
+        """
+        Returns the objects that were written by more than one thread, or read
+        by one thread while another wrote them, and those only read, but by
+        more than one thread.
+        """
+        races = []
+        shared_reads = []
+        for entry in self.merge().values():
+            writers = set(entry["writes"])
+            threads = writers | set(entry["reads"])
+            if writers and len(threads) > 1:
+                races.append(entry)
+            elif not writers and len(threads) > 1:
+                shared_reads.append(entry)
+
+        def weight(entry):
+            threads = set(entry["reads"]) | set(entry["writes"])
+            accesses = sum(
+                count
+                for counts in (*entry["reads"].values(), *entry["writes"].values())
+                for count in counts.values()
+            )
+            return len(threads), accesses
+
+        races.sort(key=weight, reverse=True)
+        shared_reads.sort(key=weight, reverse=True)
+        return races, shared_reads
+
+    def write(self, filename):
+        races, shared_reads = self.findings()
+        with open(filename, "w") as fd:
+            fd.write(
+                f"{len(races)} object(s) written by one thread and accessed by "
+                "another\n"
+            )
+            for entry in races:
+                write_entry(fd, entry)
+            fd.write(
+                f"\n{len(shared_reads)} object(s) only read, but by more than "
+                f"one thread (showing {min(len(shared_reads), SHARED_READS_LIMIT)})\n"
+            )
+            for entry in shared_reads[:SHARED_READS_LIMIT]:
+                write_entry(fd, entry)
+        return races, shared_reads
+
+
+def write_entry(fd, entry):
+    threads = set(entry["reads"]) | set(entry["writes"])
+    if entry["writes"]:
+        fd.write(
+            f"\n{entry['description']}: written by {len(entry['writes'])} "
+            f"thread(s), accessed by {len(threads)}\n"
+        )
+    else:
+        fd.write(f"\n{entry['description']}: read by {len(threads)} thread(s)\n")
+    for kind in ("writes", "reads"):
+        locations = {}
+        for counts in entry[kind].values():
+            for location, count in counts.items():
+                nthreads, total = locations.get(location, (0, 0))
+                locations[location] = (nthreads + 1, total + count)
+        for (filename, lineno, function, label), (nthreads, total) in sorted(
+            locations.items(), key=lambda item: -item[1][1]
+        ):
+            fd.write(
+                f"  {kind[:-1]:<5} {filename}:{lineno} in {function}: {label} "
+                f"({nthreads} thread(s), {total} time(s))\n"
+            )
@@ -0,0 +1,38 @@
+import collections
+import math
+import random
+
+from fib import bench, fib
+
+# Task sizes are fibonacci depths drawn from a Pareto distribution, so that
+# most tasks are small but a few are very large. The cost of fib(n) grows by
+# a factor of PHI for each increase of n.
+PHI = (1 + 5**0.5) / 2
+MIN_DEPTH = 22
+MAX_DEPTH = 30
+PARETO_ALPHA = 0.8
+SEED = 0
+
+# The number of tasks, and the size of each: the largest depth, with the
+# others spread below it as above
+COUNT = 64
+SIZE = MAX_DEPTH
+
+
+def task_cost(n):
+    """The relative cost of a task, for longest-job-first scheduling."""
+    return PHI**n
+
+
+def get_data(count=COUNT, size=SIZE):
+    r = random.Random(SEED)
+    smallest = size - (MAX_DEPTH - MIN_DEPTH)
+    return [
+        min(size, smallest + int(math.log(r.paretovariate(PARETO_ALPHA), PHI)))
+        for _ in range(count)
+    ]
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    expected = collections.Counter(fib(n) for n in get_data(count, size))
+    assert collections.Counter(result) == expected
@@ -0,0 +1,39 @@
+"""
+Running the tasks in chunks, for the executor-based pools, and folding the
+results of a chunk inside the worker, for map-reduce.
+"""
+
+import itertools
+
+
+def run_chunk(func, *chunk):
+    # The elements are separate arguments, and the results a tuple, so that
+    # InterpreterExecutor can share them without pickling
+    return tuple(func(elem) for elem in chunk)
+
+
+class FoldChunk:
+    """
+    Runs `func` on each element of a chunk, and folds the results into one
+    partial aggregate with `combine(aggregate, result)`, starting from
+    `initial`, so that only the aggregate is sent back to the parent.
+    `combine` returns the new aggregate rather than updating `initial`, which
+    thread workers share.
+    """
+
+    def __init__(self, func, combine, initial):
+        self.func = func
+        self.combine = combine
+        self.initial = initial
+
+    def __call__(self, chunk):
+        aggregate = self.initial
+        for elem in chunk:
+            aggregate = self.combine(aggregate, self.func(elem))
+        return aggregate
+
+
+def chunked(data, chunksize):
+    it = iter(data)
+    while chunk := list(itertools.islice(it, chunksize)):
+        yield chunk
@@ -0,0 +1,234 @@
+"""
+Compare two sets of results from get_data.py, e.g. before and after a change
+to a pool implementation or interpreter branch.
+
+For every mode in both, and every metric in `METRICS`, the relative change of
+the median from the baseline to the new results is reported with:
+
+  - a 95% bootstrap confidence interval: the samples of each side are
+    resampled with replacement, and the interval is the middle 95% of the
+    resulting changes in the medians.
+  - a p-value from a two-sided permutation test of the same change in the
+    medians: how often shuffling the samples between the two sides gives a
+    change at least as large as the one observed.
+
+A change is flagged as a regression if it makes the metric worse by more than
+`--threshold`, and is significant at `--alpha`. This needs several runs of
+each side (`get_data.py --runs N`); results with a single sample per mode are
+compared by their values alone, without a confidence interval or p-value.
+
+CPU is compared as the total CPU seconds (`user_time` + `system_time`). The
+utilization, `cpu`, is only reported, since a mode that uses more cores to
+finish sooner raises it. Differences in the environment of the two sides,
+including the number of workers, are printed first.
+
+Exits with status 1 if there are any regressions.
+
+Usage: compare.py baseline.json new.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+
+# Metrics to compare, and whether lower values are better, or None for
+# metrics that are only reported. More CPU seconds for the same work means
+# time spent spinning or contending, but higher CPU utilization (`cpu`, as a
+# percentage) may just mean more cores used to finish sooner.
+METRICS = {
+    "wall_clock": True,
+    "compute_median": True,
+    "cpu_time": True,
+    "cpu": None,
+    "pss_peak": True,
+    "parent_pss_peak": True,
+    "worker_pss_peak": True,
+}
+
+# Metrics that are the sum of others, per run
+DERIVED = {"cpu_time": ("user_time", "system_time")}
+
+ENVIRONMENT_KEYS = [
+    "python",
+    "interpreter_commit",
+    "cpu_model",
+    "ncpu",
+    "kernel",
+    "workers",
+]
+
+
+def samples(result, metric):
+    if metric in DERIVED:
+        parts = [samples(result, part) for part in DERIVED[metric]]
+        if not all(parts) or len({len(part) for part in parts}) > 1:
+            return []
+        return [sum(vals) for vals in zip(*parts)]
+    if metric in result.get("samples", {}):
+        return result["samples"][metric]
+    if metric in result:
+        return [result[metric]]
+    return []
+
+
+def relative_change(baseline, new):
+    old = statistics.median(baseline)
+    if old == 0:
+        return 0.0 if statistics.median(new) == 0 else float("inf")
+    return statistics.median(new) / old - 1
+
+
+def bootstrap_interval(baseline, new, rng, iterations=2000, confidence=0.95):
+    changes = sorted(
+        relative_change(
+            rng.choices(baseline, k=len(baseline)), rng.choices(new, k=len(new))
+        )
+        for _ in range(iterations)
+    )
+    tail = (1 - confidence) / 2
+    return (
+        changes[int(tail * (iterations - 1))],
+        changes[int((1 - tail) * (iterations - 1))],
+    )
+
+
+def permutation_test(baseline, new, rng, iterations=10000):
+    observed = abs(relative_change(baseline, new))
+    pooled = list(baseline) + list(new)
+    n = len(baseline)
+    extreme = 0
+    for _ in range(iterations):
+        rng.shuffle(pooled)
+        if abs(relative_change(pooled[:n], pooled[n:])) >= observed:
+            extreme += 1
+    # Count the observed arrangement too, so p is never 0
+    return (extreme + 1) / (iterations + 1)
+
+
+def compare(baseline, new, threshold, alpha, seed=0):
+    """
+    Returns one comparison per mode and metric present on both sides, as a
+    dict with the relative change, its confidence interval, the p-value, and
+    whether it is a regression.
+    """
+    # Seeded, so that comparing the same files gives the same numbers
+    rng = random.Random(seed)
+    comparisons = []
+    for mode in baseline:
+        if mode not in new:
+            continue
+        for metric, lower_is_better in METRICS.items():
+            old = samples(baseline[mode], metric)
+            cur = samples(new[mode], metric)
+            if not old or not cur:
+                continue
+            change = relative_change(old, cur)
+            if len(old) > 1 and len(cur) > 1:
+                interval = bootstrap_interval(old, cur, rng)
+                p = permutation_test(old, cur, rng)
+            else:
+                interval = p = None
+            if lower_is_better is None:
+                worse = False
+            elif lower_is_better:
+                worse = change > threshold
+            else:
+                worse = change < -threshold
+            comparisons.append(
+                {
+                    "mode": mode,
+                    "metric": metric,
+                    "baseline": statistics.median(old),
+                    "new": statistics.median(cur),
+                    "change": change,
+                    "interval": interval,
+                    "p": p,
+                    "regression": worse and (p is None or p < alpha),
+                }
+            )
+    return comparisons
+
+
+def environment(result):
+    # The number of workers is kept with the results, not the environment
+    return {"workers": result.get("workers"), **result.get("environment", {})}
+
+
+def environment_differences(baseline, new):
+    """Returns the environment keys that differ between the two sides."""
+    differences = {}
+    for mode in baseline:
+        if mode not in new:
+            continue
+        old = environment(baseline[mode])
+        cur = environment(new[mode])
+        for key in ENVIRONMENT_KEYS:
+            if old.get(key) != cur.get(key):
+                differences.setdefault(key, set()).add((old.get(key), cur.get(key)))
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare two result files from get_data.py and flag "
+        "regressions in wall clock, CPU and memory"
+    )
+    parser.add_argument("baseline", help="The results to compare against")
+    parser.add_argument("new", help="The new results")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        help="The smallest relative change that counts as a regression",
+        default=0.02,
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        help="The significance level for a change to count as a regression",
+        default=0.05,
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Show every metric of every mode, not just regressions and "
+        "significant changes",
+    )
+    args = parser.parse_args()
+
+    baseline = json.load(open(args.baseline))
+    new = json.load(open(args.new))
+
+    for key, pairs in environment_differences(baseline, new).items():
+        for old, cur in sorted(pairs, key=str):
+            print(f"{key} differs: {old!r} -> {cur!r}")
+
+    comparisons = compare(baseline, new, args.threshold, args.alpha)
+    print(
+        f"{'mode':<28} {'metric':<16} {'baseline':>12} {'new':>12} "
+        f"{'change':>8} {'95% CI':>19} {'p':>7}"
+    )
+    for c in comparisons:
+        significant = c["p"] is not None and c["p"] < args.alpha
+        if not (args.all or c["regression"] or significant):
+            continue
+        interval = (
+            f"[{c['interval'][0]:+7.1%}, {c['interval'][1]:+7.1%}]"
+            if c["interval"] is not None
+            else "-"
+        )
+        p = f"{c['p']:.4f}" if c["p"] is not None else "-"
+        flag = "  REGRESSION" if c["regression"] else ""
+        print(
+            f"{c['mode']:<28} {c['metric']:<16} {c['baseline']:>12.4g} "
+            f"{c['new']:>12.4g} {c['change']:>+8.1%} {interval:>19} {p:>7}{flag}"
+        )
+
+    regressions = [c for c in comparisons if c["regression"]]
+    print(f"\n{len(regressions)} regression(s) in {len(comparisons)} comparisons")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
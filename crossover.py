@@ -0,0 +1,243 @@
+"""
+Sweep payload types and sizes across pool modes, to find where threads,
+subinterpreters and subprocesses each win at moving data.
+
+For every mode, one pool is created, and for every payload type and size, a
+payload is made in the parent and echoed back from the workers (see
+payloads.py), so each task is a full round trip. Two things are measured:
+
+  - latency: the time for one task's round trip on an otherwise idle pool.
+  - throughput: the payload bytes moved per second, both ways, when every
+    worker is echoing a payload at once.
+
+Each is the best of `--repeat` runs. The results are written to a JSON file,
+and a table is printed with the winning mode for each type and size, followed
+by the crossover points: the sizes at which the winner changes.
+
+Modes run in this interpreter, so run this under the nogil interpreter to
+measure its modes.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import pool
+from payloads import PAYLOADS, echo
+import subinterpreters
+from transport import TRANSPORTS
+
+# 8 B to 128 MB, in steps of 8x
+SIZES = [8**i for i in range(1, 10)]
+
+# Cap the data in flight in a throughput round, so that the large payloads
+# don't run out of memory
+ROUND_BYTES = 1 << 28
+
+
+def default_modes(transport):
+    # sequential never copies the payload, so it isn't a contender
+    modes = ["thread", "futures", "subprocess"]
+    if pool.SubinterpreterPool is not None:
+        modes.extend(["interp", "interp2"])
+    if (
+        subinterpreters.interpreters is not None
+        and sys.version_info >= (3, 12)
+        and not subinterpreters.shm_breaks_interp_stock(transport)
+    ):
+        modes.append("interp-stock")
+    return modes
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:g} {unit}"
+        size /= 1024
+    return f"{size:g} TiB"
+
+
+def measure(p, func, receiver_type, payload, size, ntasks, repeat):
+    def round_trip(n):
+        start = time.perf_counter()
+        with receiver_type() as receiver:
+            results = receiver(p.map(func, [payload] * n, 1))
+            assert len(results) == n
+            del results
+        return time.perf_counter() - start
+
+    latency = min(round_trip(1) for _ in range(repeat))
+    elapsed = min(round_trip(ntasks) for _ in range(repeat))
+    return {"latency": latency, "throughput": 2 * size * ntasks / elapsed}
+
+
+def winners(results, metric):
+    """Returns the best mode for each (kind, size), by `metric`."""
+    # Lower latency is better, higher throughput is better
+    sign = 1 if metric == "latency" else -1
+    best = {}
+    for result in results:
+        key = (result["kind"], result["size"])
+        if key not in best or sign * result[metric] < sign * best[key][metric]:
+            best[key] = result
+    return {key: result["mode"] for key, result in best.items()}
+
+
+def crossover_points(best, kind, sizes):
+    """
+    Returns the runs of sizes with the same winner for `kind`, as a list of
+    (mode, first size, last size).
+    """
+    runs = []
+    for size in sizes:
+        mode = best.get((kind, size))
+        if mode is None:
+            continue
+        if runs and runs[-1][0] == mode:
+            runs[-1][2] = size
+        else:
+            runs.append([mode, size, size])
+    return [tuple(run) for run in runs]
+
+
+def print_table(results, kinds, sizes, modes, metric, unit, scale):
+    best = winners(results, metric)
+    by_key = {(r["mode"], r["kind"], r["size"]): r[metric] for r in results}
+    print(f"\n{metric} ({unit})")
+    header = f"{'payload':<8} {'size':>9} " + " ".join(f"{m:>12}" for m in modes)
+    print(header + "  best")
+    for kind in kinds:
+        for size in sizes:
+            if (kind, size) not in best:
+                continue
+            values = " ".join(
+                f"{by_key[(m, kind, size)] * scale:>12.4g}"
+                if (m, kind, size) in by_key
+                else f"{'-':>12}"
+                for m in modes
+            )
+            print(f"{kind:<8} {format_size(size):>9} {values}  {best[(kind, size)]}")
+
+    print(f"\n{metric} crossover points")
+    for kind in kinds:
+        runs = crossover_points(best, kind, sizes)
+        print(
+            f"{kind:<8} "
+            + ", ".join(
+                f"{mode} ({format_size(first)} - {format_size(last)})"
+                for mode, first, last in runs
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure round-trip latency and throughput of payloads of "
+        "various types and sizes across pool modes"
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        help="The pool.py modes to compare (default: all available ones)",
+        default=None,
+    )
+    parser.add_argument(
+        "--kinds",
+        nargs="+",
+        choices=list(PAYLOADS),
+        help="The payload types (default: all available ones)",
+        default=list(PAYLOADS),
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        help="The payload sizes, in bytes (default: 8 B to 128 MB)",
+        default=SIZES,
+    )
+    parser.add_argument(
+        "--workers", type=int, help="The number of workers to run", default=16
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="The number of runs of each measurement to take the best of",
+        default=3,
+    )
+    parser.add_argument(
+        "--transport",
+        choices=list(TRANSPORTS),
+        help="How results are sent back from the workers",
+        default="pickle",
+    )
+    parser.add_argument(
+        "-o", "--output", help="The JSON file to write", default="crossover.json"
+    )
+    args = parser.parse_args()
+    modes = args.modes or default_modes(args.transport)
+    if "interp-stock" in modes and subinterpreters.shm_breaks_interp_stock(
+        args.transport
+    ):
+        parser.error("--transport shm needs CPython 3.13+ with interp-stock")
+    sizes = sorted(args.sizes)
+    transport = TRANSPORTS[args.transport]
+
+    results = []
+    for mode in modes:
+        with pool.get_pool_type(mode)(args.workers) as p:
+            func = transport.wrap(echo)
+            for kind in args.kinds:
+                for size in sizes:
+                    payload = PAYLOADS[kind](size)
+                    ntasks = max(1, min(args.workers, ROUND_BYTES // size))
+                    try:
+                        result = measure(
+                            p,
+                            func,
+                            transport.receiver,
+                            payload,
+                            size,
+                            ntasks,
+                            args.repeat,
+                        )
+                    except Exception as exc:
+                        # e.g. NumPy can't be imported in subinterpreters
+                        print(f"Skipping {mode} {kind}: {exc!r}", file=sys.stderr)
+                        break
+                    finally:
+                        del payload
+                    result.update({"mode": mode, "kind": kind, "size": size})
+                    print(
+                        f"{mode} {kind} {format_size(size)}: "
+                        f"latency {result['latency']:.6f} s, "
+                        f"throughput {result['throughput'] / 1e6:.1f} MB/s",
+                        file=sys.stderr,
+                    )
+                    results.append(result)
+
+    print_table(results, args.kinds, sizes, modes, "latency", "ms", 1e3)
+    print_table(results, args.kinds, sizes, modes, "throughput", "MB/s", 1e-6)
+
+    with open(args.output, "w") as fd:
+        json.dump(
+            {
+                "python": sys.version,
+                "workers": args.workers,
+                "transport": args.transport,
+                "results": results,
+                "winners": {
+                    metric: [
+                        {"kind": kind, "size": size, "mode": mode}
+                        for (kind, size), mode in winners(results, metric).items()
+                    ]
+                    for metric in ("latency", "throughput")
+                },
+            },
+            fd,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
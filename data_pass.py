@@ -1,11 +1,38 @@
-def bench(_indata):
-    return [1000.0] * (1 << 16)
+# The number of tasks, and the size of each: the length of the list of floats
+# it returns
+COUNT = 1 << 10
+SIZE = 1 << 16
 
 
-def get_data():
-    return [1000.0] * (1 << 10)
+def bench(size):
+    return [1000.0] * size
 
 
-def assert_result(result):
-    assert len(result) == (1 << 10)
-    assert all(len(x) == (1 << 16) for x in result)
+def get_data(count=COUNT, size=SIZE):
+    return [size] * count
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    n = 0
+    for x in result:
+        assert len(x) == size
+        n += 1
+    assert n == count
+
+
+# For --reduce: each worker folds its results into the number of results and
+# their total length, rather than sending them all back
+INITIAL = (0, 0)
+
+
+def combine(aggregate, result):
+    n, length = aggregate
+    return n + 1, length + len(result)
+
+
+def merge(a, b):
+    return a[0] + b[0], a[1] + b[1]
+
+
+def assert_reduced(aggregate, count=COUNT, size=SIZE):
+    assert aggregate == (count, count * size)
@@ -0,0 +1,28 @@
+import array
+
+# For --reduce: the number of results and their total length
+from data_pass import INITIAL, assert_reduced, combine, merge
+
+# The number of tasks, and the size of each: the length of the array of
+# doubles it returns
+COUNT = 1 << 10
+SIZE = 1 << 16
+
+
+# The same as data_pass, but the result is an array of doubles rather than a
+# list of floats, so it can be sent as a raw buffer rather than pickled
+# element by element.
+def bench(size):
+    return array.array("d", [1000.0]) * size
+
+
+def get_data(count=COUNT, size=SIZE):
+    return [size] * count
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    n = 0
+    for x in result:
+        assert len(x) == size
+        n += 1
+    assert n == count
@@ -1,13 +1,47 @@
+# The number of tasks, and the size of each: the fibonacci depth
+COUNT = 64
+SIZE = 28
+
+
 def bench(n):
     if n < 2:
         return 1
     return bench(n - 1) + bench(n - 2)
 
 
-def get_data():
-    return [28] * 64
+def fib(n):
+    # The same as bench(n), in linear time, to check the results
+    a, b = 1, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+
+def get_data(count=COUNT, size=SIZE):
+    return [size] * count
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    expected = fib(size)
+    n = 0
+    for x in result:
+        assert x == expected
+        n += 1
+    assert n == count
+
+
+# For --reduce: each worker folds its results into their number and their sum
+INITIAL = (0, 0)
+
+
+def combine(aggregate, result):
+    n, total = aggregate
+    return n + 1, total + result
+
+
+def merge(a, b):
+    return a[0] + b[0], a[1] + b[1]
 
 
-def assert_result(result):
-    assert len(result) == 64
-    assert all(x == 514229 for x in result)
+def assert_reduced(aggregate, count=COUNT, size=SIZE):
+    assert aggregate == (count, count * fib(size))
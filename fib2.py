@@ -1,3 +1,6 @@
+from fib import COUNT, INITIAL, SIZE, assert_reduced, combine, fib, merge
+
+
 class Fibonacci:
     def __init__(self, x):
         self.x = x
@@ -27,10 +30,14 @@ def bench(n):
     return f.calculate(n)
 
 
-def get_data():
-    return [28] * 64
+def get_data(count=COUNT, size=SIZE):
+    return [size] * count
 
 
-def assert_result(result):
-    assert len(result) == 64
-    assert all(x == 514229 for x in result)
+def assert_result(result, count=COUNT, size=SIZE):
+    expected = fib(size)
+    n = 0
+    for x in result:
+        assert x == expected
+        n += 1
+    assert n == count
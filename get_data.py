@@ -1,57 +1,530 @@
 import argparse
+import functools
+import hashlib
 import json
+import os
+from pathlib import Path
+import platform
+import re
 import shutil
+import statistics
 import subprocess
+import time
 
 py = "venv/bin/python"
 nogil_py = "venv-nogil/bin/python"
 pip = [py, "-m", "pip"]
 
-shutil.rmtree("venv")
-subprocess.check_call(["../cpython/python", "-m", "venv", "venv"])
-shutil.rmtree("venv-nogil", ignore_errors=True)
-subprocess.check_call(["../cpython-nogil/python", "-m", "venv", "venv-nogil"])
-subprocess.check_call(
-    [
-        py,
-        "-m",
-        "pip",
-        "install",
-        "git+https://github.com/mdboom/extrainterpreters@main#egg-info=extrainterpreters",
-    ]
-)
-for p in [py, nogil_py]:
-    subprocess.check_call([p, "-m", "pip", "install", "gilknocker"])
+# The base interpreter and the packages to install for each venv
+VENVS = {
+    "venv": (
+        "../cpython/python",
+        [
+            "git+https://github.com/mdboom/extrainterpreters@main"
+            "#egg-info=extrainterpreters",
+            "gilknocker",
+            "numpy",
+        ],
+    ),
+    "venv-nogil": ("../cpython-nogil/python", ["gilknocker", "numpy"]),
+}
+
+# Results are cached in CACHE_DIR, keyed by everything that can affect them.
+# Bump HARNESS_VERSION when a change to how results are collected or parsed
+# should invalidate the cache; changes to the HARNESS_FILES themselves are
+# picked up automatically.
+CACHE_DIR = Path(".cache") / "results"
+HARNESS_VERSION = 1
+HARNESS_FILES = [
+    "affinity.py",
+    "audit.py",
+    "chunking.py",
+    "get_data.py",
+    "pool.py",
+    "procmon.py",
+    "profiling.py",
+    "startup.py",
+    "subinterpreters.py",
+    "tracing.py",
+    "transport.py",
+]
+
+
+@functools.cache
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fd:
+        for block in iter(lambda: fd.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def hash_interpreter(python_exec):
+    # venv pythons are symlinks to the interpreter they were created from
+    return hash_file(os.path.realpath(python_exec))
+
+
+@functools.cache
+def interpreter_paths(python_exec):
+    """
+    Returns the directory of the `multiprocessing` package that `python_exec`
+    imports, and its site-packages directory.
+    """
+    return json.loads(
+        subprocess.check_output(
+            [
+                python_exec,
+                "-c",
+                "import json, multiprocessing, sysconfig; "
+                "print(json.dumps([multiprocessing.__path__[0], "
+                "sysconfig.get_path('purelib')]))",
+            ]
+        )
+    )
+
+
+def hash_tree(path):
+    """Hashes the Python source files under `path`, and their names."""
+    h = hashlib.sha256()
+    for file in sorted(Path(path).rglob("*.py")):
+        h.update(f"{file.relative_to(path)} {hash_file(file)}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def installed_packages(site_packages):
+    """
+    Returns the name and version of each package installed in
+    `site_packages`, with the commit that those installed from git were built
+    from, or None.
+    """
+    packages = {}
+    for dist_info in sorted(Path(site_packages).glob("*.dist-info")):
+        direct_url = dist_info / "direct_url.json"
+        commit = None
+        if direct_url.exists():
+            vcs_info = json.loads(direct_url.read_text()).get("vcs_info", {})
+            commit = vcs_info.get("commit_id")
+        packages[dist_info.name.removesuffix(".dist-info")] = commit
+    return packages
+
+
+def benchmark_sources(name, seen=None):
+    """
+    Returns the source files of the benchmark module `name`, and of the
+    modules in this directory that it imports, transitively.
+    """
+    if seen is None:
+        seen = set()
+    path = Path(__file__).parent / f"{name}.py"
+    if not path.exists() or path in seen:
+        return seen
+    seen.add(path)
+    for imported in re.findall(
+        r"^\s*(?:from|import)\s+(\w+)", path.read_text(), re.MULTILINE
+    ):
+        benchmark_sources(imported, seen)
+    return seen
+
+
+def cpu_model():
+    with open("/proc/cpuinfo") as fd:
+        for line in fd:
+            key, _, val = line.partition(":")
+            if key.strip() == "model name":
+                return val.strip()
+    return platform.processor()
+
+
+@functools.cache
+def environment(python_exec):
+    """
+    Returns what identifies the machine and interpreter a result came from,
+    so that results from different runs can be compared.
+    """
+    python = json.loads(
+        subprocess.check_output(
+            [
+                python_exec,
+                "-c",
+                "import json, sys; "
+                "print(json.dumps("
+                "[sys.version, getattr(sys, '_git', ('', '', ''))[2]]"
+                "))",
+            ]
+        )
+    )
+    version, commit = python
+    if not commit:
+        # Interpreters built in a git checkout, like ../cpython, but installed
+        # without the commit recorded
+        source = os.path.dirname(os.path.realpath(python_exec))
+        try:
+            commit = subprocess.check_output(
+                ["git", "-C", source, "rev-parse", "HEAD"],
+                stderr=subprocess.DEVNULL,
+                text=True,
+            ).strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+    return {
+        "python": version,
+        "interpreter_commit": commit,
+        "interpreter_sha256": hash_interpreter(python_exec),
+        "cpu_model": cpu_model(),
+        "ncpu": os.cpu_count(),
+        "kernel": platform.release(),
+        "hostname": platform.node(),
+    }
+
+
+def pin_requirement(requirement):
+    """
+    Pins a requirement on a git branch (`git+URL@BRANCH`) to the commit that
+    the branch is at now, so that a venv provisioned from an older commit of
+    the branch is recreated.
+    """
+    match = re.fullmatch(r"git\+(.+?)@([^#]+)(#.*)?", requirement)
+    if match is None or re.fullmatch(r"[0-9a-f]{40}", match[2]):
+        return requirement
+    url, ref, fragment = match.groups()
+    output = subprocess.check_output(["git", "ls-remote", url, ref], text=True)
+    if not output:
+        raise ValueError(f"{ref} not found in {url}")
+    return f"git+{url}@{output.split()[0]}{fragment or ''}"
+
+
+def provision(venv, base_python, requirements):
+    """
+    Create the venv and install the requirements, unless it was already
+    provisioned from the same interpreter binary with the same requirements,
+    pinned to the same commits.
+    """
+    stamp = Path(venv) / "provisioned.json"
+    interpreter = hash_file(base_python)
+    try:
+        requirements = [pin_requirement(r) for r in requirements]
+    except (OSError, subprocess.CalledProcessError, ValueError) as exc:
+        # e.g. offline: the venv is still usable, just maybe not up to date
+        previous = json.loads(stamp.read_text()) if stamp.exists() else {}
+        if previous.get("interpreter") == interpreter:
+            print(f"Reusing {venv}, without checking its requirements: {exc}")
+            return
+        raise
+    expected = {"interpreter": interpreter, "requirements": requirements}
+    if stamp.exists() and json.loads(stamp.read_text()) == expected:
+        print(f"Reusing {venv}")
+        return
+    shutil.rmtree(venv, ignore_errors=True)
+    subprocess.check_call([base_python, "-m", "venv", venv])
+    for requirement in requirements:
+        subprocess.check_call(
+            [str(Path(venv) / "bin" / "python"), "-m", "pip", "install", requirement]
+        )
+    stamp.write_text(json.dumps(expected))
+
 
 data = {}
 
+# Mode name suffixes that select extra options of pool.py, stripped in this
+# order
+PIN_POLICIES = ["none", "compact", "scatter", "physical"]
+MODE_SUFFIXES = {
+    **{f"-pin-{policy}": ["--pin", policy] for policy in PIN_POLICIES[1:]},
+    "-reduce": ["--reduce"],
+    "-ljf": ["--schedule", "ljf"],
+    "-spawn": ["--start-method", "spawn"],
+    "-forkserver": ["--start-method", "forkserver"],
+    "-asyncio": ["--asyncio"],
+}
+
 parser = argparse.ArgumentParser(
     description="Benchmark multiprocessing pools in various modes"
 )
 parser.add_argument(
     "benchmark", type=str, nargs="?", help="The benchmark to run", default="nbody"
 )
+parser.add_argument(
+    "--chunksize",
+    type=str,
+    help="The chunksize to pass to pool.py (an integer or 'auto')",
+    default=None,
+)
+parser.add_argument(
+    "--warmup",
+    type=int,
+    help="The number of untimed rounds to run on the warm pool",
+    default=0,
+)
+parser.add_argument(
+    "--repeat",
+    type=int,
+    help="The number of timed rounds to run on the warm pool",
+    default=1,
+)
+parser.add_argument(
+    "--transport",
+    choices=["pickle", "shm"],
+    help="How results are sent back from the workers",
+    default="pickle",
+)
+parser.add_argument(
+    "--stream",
+    action="store_true",
+    help="Stream tasks and results with a bounded number of tasks in flight",
+)
+parser.add_argument(
+    "--inflight",
+    type=int,
+    help="In streaming mode, the maximum number of tasks in flight",
+    default=None,
+)
+parser.add_argument(
+    "--count",
+    type=int,
+    help="The number of tasks to pass to pool.py (default: the benchmark's)",
+    default=None,
+)
+parser.add_argument(
+    "--size",
+    type=int,
+    help="The size of each task to pass to pool.py, e.g. the fibonacci "
+    "depth, the nbody loops or the raytrace image width (default: the "
+    "benchmark's)",
+    default=None,
+)
+parser.add_argument(
+    "--sizes",
+    type=int,
+    nargs="+",
+    help="Run each mode with each of these task sizes, and write the speedup "
+    "over sequential, and the smallest size at which each mode beats it, to "
+    "<benchmark>_granularity.json",
+    default=None,
+)
+parser.add_argument(
+    "--reduce",
+    action="store_true",
+    help="Also run each mode with the results folded in the workers, as "
+    "<mode>-reduce, and report the bytes of results sent back in both",
+)
+parser.add_argument(
+    "--startup",
+    action="store_true",
+    help="Rather than running the benchmark, measure the cost of standing up "
+    "each mode's pool at 1, 2, 4, ... up to --workers workers (see pool.py "
+    "--startup), and write the costs to <benchmark>_startup.json",
+)
+parser.add_argument(
+    "--pin",
+    nargs="+",
+    choices=PIN_POLICIES,
+    help="Run each mode with each of these policies for pinning the workers "
+    "to CPUs, as <mode>-pin-<policy> (none keeps the plain mode name)",
+    default=["none"],
+)
+parser.add_argument(
+    "--trace",
+    action="store_true",
+    help="Write a per-task timeline for each mode to traces/",
+)
+parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="Write merged collapsed stacks of the workers for each mode to "
+    "profiles/",
+)
+parser.add_argument(
+    "--audit",
+    action="store_true",
+    help="Only run the modes whose workers are threads, and write a report "
+    "of the objects they share and write for each to audits/, and their "
+    "results to <benchmark>_audit.json (slow: use with small --count and "
+    "--size)",
+)
+parser.add_argument(
+    "--runs",
+    type=int,
+    help="The number of times to run pool.py for each mode. Every run's "
+    "metrics are kept in 'samples', and the medians are reported, so "
+    "compare.py can tell noise from real differences.",
+    default=1,
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    help="The number of workers to run",
+    default=16,
+)
+parser.add_argument(
+    "--sweep",
+    action="store_true",
+    help="Run each mode with 1, 2, 4, ... workers, up to twice the number of "
+    "cores, and write speedup and parallel efficiency to "
+    "<benchmark>_scaling.json",
+)
+parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="Rerun every mode rather than reusing cached results",
+)
 args = parser.parse_args()
+if args.sizes is not None and args.size is not None:
+    parser.error("--size and --sizes are mutually exclusive")
+if args.sizes is not None and args.sweep:
+    parser.error("--sweep and --sizes are mutually exclusive")
 benchmark = args.benchmark
+ncpu = os.cpu_count()
 
+for venv, (base_python, requirements) in VENVS.items():
+    provision(venv, base_python, requirements)
 
-for mode in [
+extra_args = [
+    "--warmup",
+    str(args.warmup),
+    "--repeat",
+    str(args.repeat),
+    "--transport",
+    args.transport,
+]
+if args.chunksize is not None:
+    extra_args.extend(["--chunksize", args.chunksize])
+if args.stream:
+    extra_args.append("--stream")
+if args.inflight is not None:
+    extra_args.extend(["--inflight", str(args.inflight)])
+if args.startup:
+    extra_args.append("--startup")
+if args.reduce:
+    extra_args.append("--result-bytes")
+if args.count is not None:
+    extra_args.extend(["--count", str(args.count)])
+if args.size is not None:
+    extra_args.extend(["--size", str(args.size)])
+
+os.makedirs("memory", exist_ok=True)
+if args.trace:
+    os.makedirs("traces", exist_ok=True)
+if args.profile:
+    os.makedirs("profiles", exist_ok=True)
+if args.audit:
+    os.makedirs("audits", exist_ok=True)
+
+modes = [
     "sequential",
     "interp",
     "interp2",
+    "interp-stock",
     "thread",
     "futures",
     "nogil-sequential",
     "nogil-thread",
     "nogil-futures",
     "subprocess",
-]:
-    print(f"{mode=}")
+    "subprocess-spawn",
+    "subprocess-forkserver",
+    "thread-asyncio",
+    "interp-asyncio",
+    "subprocess-asyncio",
+]
+if benchmark == "balance":
+    # Compare plain Pool.map to longest-job-first scheduling on the skewed
+    # workload
+    modes.extend(["interp-ljf", "interp2-ljf", "nogil-thread-ljf", "subprocess-ljf"])
+if args.startup:
+    # Without workers, there's no pool to stand up
+    modes = [mode for mode in modes if not mode.endswith("sequential")]
+if args.audit:
+    # Only threads share the benchmark's objects
+    modes = [
+        mode
+        for mode in modes
+        if mode.removeprefix("nogil-").split("-")[0] in ("thread", "futures")
+    ]
+if args.reduce:
+    modes = [variant for mode in modes for variant in (mode, f"{mode}-reduce")]
+modes = [
+    mode if policy == "none" else f"{mode}-pin-{policy}"
+    for mode in modes
+    for policy in args.pin
+]
+
+
+def parse_output(output):
+    result = {}
+    for line in output.splitlines():
+        if b":" not in line:
+            continue
+        parts = line.split(b":")
+        if len(parts) != 2:
+            continue
+        key, val = parts
+        match key:
+            case b"gilknocker":
+                val = float(val)
+            case b"wall_clock":
+                val = float(val)
+            case (
+                b"rss_peak"
+                | b"pss_peak"
+                | b"uss_peak"
+                | b"parent_rss_peak"
+                | b"parent_pss_peak"
+                | b"parent_uss_peak"
+                | b"worker_rss_peak"
+                | b"worker_pss_peak"
+                | b"worker_uss_peak"
+            ):
+                val = int(val.split()[0])
+            case (
+                b"worker_processes"
+                | b"voluntary_switches"
+                | b"involuntary_switches"
+            ):
+                val = int(val)
+            case b"user_time" | b"system_time" | b"run_delay":
+                val = float(val)
+            case b"cpu":
+                val = int(val[:-1])
+            case b"pin" | b"pinned_cpus":
+                val = val.strip().decode("utf-8")
+            case (
+                b"chunksize"
+                | b"inflight"
+                | b"profile_samples"
+                | b"task_count"
+                | b"task_size"
+                | b"result_bytes"
+                | b"audit_races"
+                | b"audit_shared_reads"
+            ):
+                val = int(val)
+            case (
+                b"pool_creation"
+                | b"worker_startup"
+                | b"compute_min"
+                | b"compute_median"
+                | b"compute_stddev"
+            ):
+                val = float(val)
+            case _ if (
+                key.startswith(b"latency_")
+                or key.startswith(b"loop_lag_")
+                or key.startswith(b"startup_")
+            ):
+                val = float(val)
+            case _:
+                continue
+
+        result[key.decode("utf-8")] = val
+    return result
 
-    if benchmark in ("data_pass", "balance") and mode == "interp3":
-        print(f"Skipping: {benchmark} doesn't work with interp3")
-        continue
 
+def run_mode(mode, workers, name, run=0, size=None):
+    """
+    Run pool.py for one mode, where `name` identifies the run in the names of
+    the memory, trace and profile files, and `run` is the number of the
+    repeated run. `size` overrides the size of each task.
+    """
     if mode.startswith("nogil-"):
         python_exec = nogil_py
         real_mode = mode[6:]
@@ -59,42 +532,214 @@ for mode in [
         python_exec = py
         real_mode = mode
 
+    mode_args = list(extra_args)
+    for suffix, suffix_args in MODE_SUFFIXES.items():
+        if real_mode.endswith(suffix):
+            real_mode = real_mode[: -len(suffix)]
+            mode_args.extend(suffix_args)
+    if args.trace:
+        mode_args.extend(["--trace", f"traces/{name}.json"])
+    if args.profile:
+        mode_args.extend(["--profile", f"profiles/{name}.collapsed"])
+    if args.audit:
+        mode_args.extend(["--audit", f"audits/{name}.txt"])
+    if size is not None:
+        mode_args.extend(["--size", str(size)])
+
+    # The results also depend on the interpreter's multiprocessing and the
+    # packages in its venv, e.g. the extrainterpreters commit
+    multiprocessing_dir, site_packages = interpreter_paths(python_exec)
+    key = hashlib.sha256(
+        json.dumps(
+            {
+                "harness_version": HARNESS_VERSION,
+                "harness": [hash_file(path) for path in HARNESS_FILES],
+                "interpreter": hash_interpreter(python_exec),
+                "multiprocessing": hash_tree(multiprocessing_dir),
+                "packages": installed_packages(site_packages),
+                "benchmark": benchmark,
+                "sources": sorted(
+                    hash_file(path) for path in benchmark_sources(benchmark)
+                ),
+                "mode": real_mode,
+                "workers": workers,
+                "ncpu": ncpu,
+                "args": mode_args,
+                "run": run,
+            }
+        ).encode("utf-8")
+    ).hexdigest()
+    cache_path = CACHE_DIR / f"{key}.json"
+    # Traces, profiles and audits are written as a side effect of the run, so
+    # they can't be cached
+    use_cache = (
+        not args.no_cache and not args.trace and not args.profile and not args.audit
+    )
+    if use_cache and cache_path.exists():
+        print("Using cached result")
+        return json.loads(cache_path.read_text())
+
     output = subprocess.run(
         [
-            "./memusg",
+            "./procmon.py",
+            "-o",
+            f"memory/{name}.json",
             "/usr/bin/time",
             "-f",
-            "'wall_clock: %e\ncpu: %P\n'",
+            "wall_clock: %e\ncpu: %P\n",
             python_exec,
             "pool.py",
             real_mode,
             benchmark,
+            "--workers",
+            str(workers),
+            *mode_args,
         ],
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
     ).stdout
 
-    data[mode] = {}
+    result = parse_output(output)
+    result["workers"] = workers
+    result["ncpu"] = ncpu
+    # Don't cache failed runs
+    if "wall_clock" in result:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(result))
+    return result
 
-    for line in output.splitlines():
-        if b":" not in line:
+
+def run_repeated(mode, workers, name, size=None):
+    """
+    Run one mode `--runs` times, and return the median of each metric, with
+    every run's values in "samples" and the environment they came from.
+    """
+    runs = [run_mode(mode, workers, name, run, size) for run in range(args.runs)]
+    # Don't let a failed run skew the medians
+    succeeded = [run for run in runs if "wall_clock" in run] or runs[-1:]
+    result = dict(succeeded[0])
+    samples = {}
+    for run in succeeded:
+        for key, val in run.items():
+            if isinstance(val, (int, float)) and key not in ("workers", "ncpu"):
+                samples.setdefault(key, []).append(val)
+    for key, vals in samples.items():
+        result[key] = statistics.median(vals)
+    result["runs"] = len(succeeded)
+    result["samples"] = samples
+    result["environment"] = environment(
+        nogil_py if mode.startswith("nogil-") else py
+    )
+    return result
+
+
+def worker_counts():
+    """Powers of two up to the number of cores, then oversubscribed."""
+    counts = []
+    n = 1
+    while n < ncpu:
+        counts.append(n)
+        n *= 2
+    counts.extend([ncpu, ncpu * 2])
+    return counts
+
+
+def add_speedup(result, baseline):
+    result["speedup"] = baseline["wall_clock"] / result["wall_clock"]
+    result["efficiency"] = result["speedup"] / result["workers"]
+    if "compute_median" in result and "compute_median" in baseline:
+        result["compute_speedup"] = (
+            baseline["compute_median"] / result["compute_median"]
+        )
+        result["compute_efficiency"] = result["compute_speedup"] / result["workers"]
+
+
+if args.sweep:
+    # The sequential modes don't depend on the number of workers, so they
+    # are run once as the baseline for all of the others.
+    sequential = {}
+    scaling = {}
+    for mode in modes:
+        if mode.split("-pin-")[0].endswith("sequential"):
+            print(f"{mode=}")
+            sequential[mode] = run_repeated(mode, 1, f"{benchmark}-{mode}")
             continue
-        parts = line.split(b":")
-        if len(parts) != 2:
+
+        scaling[mode] = {}
+        for workers in worker_counts():
+            print(f"{mode=} {workers=}")
+            result = run_repeated(mode, workers, f"{benchmark}-{mode}-{workers}")
+            baseline = sequential.get("sequential", {})
+            if "wall_clock" in result and "wall_clock" in baseline:
+                add_speedup(result, baseline)
+            scaling[mode][str(workers)] = result
+
+    json.dump(
+        {"ncpu": ncpu, "sequential": sequential, "modes": scaling},
+        open(f"{benchmark}_scaling.json", "w"),
+        indent=2,
+    )
+elif args.sizes:
+    # Find the smallest task size at which each mode beats sequential, on
+    # the compute time, which leaves out the interpreter and pool startup
+    sizes = sorted(args.sizes)
+    granularity = {}
+    break_even = {}
+    for mode in modes:
+        granularity[mode] = {}
+        for size in sizes:
+            print(f"{mode=} {size=}")
+            result = run_repeated(
+                mode, args.workers, f"{benchmark}-{mode}-size{size}", size
+            )
+            baseline = granularity.get("sequential", {}).get(str(size), {})
+            if "wall_clock" in result and "wall_clock" in baseline:
+                add_speedup(result, baseline)
+            granularity[mode][str(size)] = result
+
+        if mode != "sequential":
+            break_even[mode] = next(
+                (
+                    size
+                    for size in sizes
+                    if granularity[mode][str(size)].get("compute_speedup", 0) > 1
+                ),
+                None,
+            )
+            print(f"{mode} beats sequential from size {break_even[mode]}")
+
+    json.dump(
+        {
+            "ncpu": ncpu,
+            "workers": args.workers,
+            "sizes": sizes,
+            "modes": granularity,
+            "break_even": break_even,
+        },
+        open(f"{benchmark}_granularity.json", "w"),
+        indent=2,
+    )
+else:
+    for mode in modes:
+        print(f"{mode=}")
+
+        if benchmark in ("data_pass", "balance") and mode == "interp3":
+            print(f"Skipping: {benchmark} doesn't work with interp3")
             continue
-        key, val = parts
-        match key:
-            case b"gilknocker":
-                val = float(val)
-            case b"wall_clock":
-                val = float(val)
-            case b"vmpeak":
-                val = int(val.split()[0])
-            case b"cpu":
-                val = int(val[:-1])
-            case _:
-                continue
 
-        data[mode][key.decode("utf-8")] = val
+        data[mode] = run_repeated(mode, args.workers, f"{benchmark}-{mode}")
 
-json.dump(data, open(f"{benchmark}.json", "w"), indent=2)
+    if args.startup:
+        # The startup costs aren't results of the benchmark, so they don't
+        # replace <benchmark>.json
+        json.dump(data, open(f"{benchmark}_startup.json", "w"), indent=2)
+    elif args.audit:
+        # Nor are the results of a few traced thread modes
+        json.dump(data, open(f"{benchmark}_audit.json", "w"), indent=2)
+    else:
+        json.dump(data, open(f"{benchmark}.json", "w"), indent=2)
+        # <benchmark>.json is overwritten by the next run, so keep a copy for
+        # compare.py
+        os.makedirs("history", exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        json.dump(data, open(f"history/{benchmark}-{stamp}.json", "w"), indent=2)
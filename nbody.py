@@ -3,6 +3,11 @@ import copy
 DEFAULT_ITERATIONS = 20000
 DEFAULT_REFERENCE = "sun"
 
+# The number of tasks, and the size of each: the number of loops of
+# DEFAULT_ITERATIONS steps
+COUNT = 64
+SIZE = 10
+
 
 def combinations(l):
     """Pure-Python implementation of itertools.combinations(l, 2)."""
@@ -121,10 +126,31 @@ def bench(loops, reference=DEFAULT_REFERENCE, iterations=DEFAULT_ITERATIONS):
     return result
 
 
-def get_data():
-    return [10] * 64
+def get_data(count=COUNT, size=SIZE):
+    return [size] * count
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    n = 0
+    for x in result:
+        assert len(x) == size
+        n += 1
+    assert n == count
+
+
+# For --reduce: each worker folds its results into the number of results and
+# their total length, rather than sending them all back
+INITIAL = (0, 0)
+
+
+def combine(aggregate, result):
+    n, length = aggregate
+    return n + 1, length + len(result)
+
+
+def merge(a, b):
+    return a[0] + b[0], a[1] + b[1]
 
 
-def assert_result(result):
-    assert len(result) == 64
-    assert all(len(x) == 10 for x in result)
+def assert_reduced(aggregate, count=COUNT, size=SIZE):
+    assert aggregate == (count, count * size)
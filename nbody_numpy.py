@@ -0,0 +1,113 @@
+"""
+A vectorized NumPy engine for the nbody benchmark.
+
+Rather than looping in Python over the pairs of bodies of one system, the
+positions, velocities and masses of many independent copies of the system are
+stored as struct-of-arrays ndarrays, and all of them are advanced at once with
+batched pairwise force computations. Each task advances a batch of systems,
+so the batch can also be split across pool workers (see nbody_numpy_split).
+"""
+
+import copy
+
+import numpy as np
+
+import nbody
+
+NSYSTEMS = 64
+LOOPS = 10
+
+# The number of tasks, to split the systems between, and the size of each:
+# the number of loops of nbody.DEFAULT_ITERATIONS steps
+COUNT = 1
+SIZE = LOOPS
+
+
+def initial_system(reference=nbody.DEFAULT_REFERENCE):
+    bodies = copy.deepcopy(nbody.BODIES)
+    system = list(bodies.values())
+    nbody.offset_momentum(bodies[reference], system)
+    return system
+
+
+SYSTEM = initial_system()
+REFERENCE_ENERGY = nbody.report_energy(SYSTEM, nbody.combinations(SYSTEM))
+# The energy of the system is conserved, up to the error of the integrator
+ENERGY_TOLERANCE = 1e-4
+
+FIRST, SECOND = np.triu_indices(len(SYSTEM), 1)
+
+
+def make_state(nsystems):
+    """
+    Returns the positions and velocities, of shape (nsystems, nbodies, 3),
+    and the masses, of shape (nbodies,), of `nsystems` copies of the system.
+    """
+    positions = np.array([r for r, v, m in SYSTEM], dtype=np.float64)
+    velocities = np.array([v for r, v, m in SYSTEM], dtype=np.float64)
+    masses = np.array([m for r, v, m in SYSTEM], dtype=np.float64)
+    return (
+        np.repeat(positions[np.newaxis], nsystems, axis=0),
+        np.repeat(velocities[np.newaxis], nsystems, axis=0),
+        masses,
+    )
+
+
+def pair_weights(masses):
+    """
+    Returns a (npairs, nbodies) matrix that scatters the pairwise impulses to
+    the bodies: the first body of each pair is pushed away by the mass of
+    the second, and the second body pulled by the mass of the first.
+    """
+    weights = np.zeros((len(FIRST), len(masses)))
+    pairs = np.arange(len(FIRST))
+    weights[pairs, FIRST] = -masses[SECOND]
+    weights[pairs, SECOND] = masses[FIRST]
+    return weights
+
+
+def advance(dt, n, positions, velocities, masses):
+    weights = pair_weights(masses)
+    for i in range(n):
+        d = positions[:, FIRST] - positions[:, SECOND]
+        mag = dt * np.einsum("spk,spk->sp", d, d) ** -1.5
+        velocities += np.einsum("pb,spk->sbk", weights, d * mag[..., np.newaxis])
+        positions += dt * velocities
+
+
+def report_energy(positions, velocities, masses):
+    """Returns the energy of each of the systems."""
+    d = positions[:, FIRST] - positions[:, SECOND]
+    potential = (masses[FIRST] * masses[SECOND]) / np.sqrt(
+        np.einsum("spk,spk->sp", d, d)
+    )
+    kinetic = masses * np.einsum("sbk,sbk->sb", velocities, velocities) / 2.0
+    return kinetic.sum(axis=1) - potential.sum(axis=1)
+
+
+def bench(args, iterations=nbody.DEFAULT_ITERATIONS):
+    nsystems, loops = args
+    positions, velocities, masses = make_state(nsystems)
+
+    energies = []
+    for x in range(loops):
+        advance(0.01, iterations, positions, velocities, masses)
+        energies.append(report_energy(positions, velocities, masses))
+
+    # One list of energies per system, as nbody.bench returns for one system
+    return np.array(energies).T.tolist()
+
+
+def get_data(count=COUNT, size=SIZE):
+    return [(NSYSTEMS // count, size)] * count
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    n = 0
+    for batch in result:
+        for energies in batch:
+            assert len(energies) == size
+            assert all(abs(e - REFERENCE_ENERGY) < ENERGY_TOLERANCE for e in energies)
+            n += 1
+    # Any remainder of NSYSTEMS that doesn't divide evenly is dropped
+    assert n == NSYSTEMS // count * count
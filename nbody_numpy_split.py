@@ -0,0 +1,15 @@
+import nbody_numpy
+from nbody_numpy import *
+
+# Split the batch of systems into this many tasks, to spread it across pool
+# workers.
+BATCHES = 16
+COUNT = BATCHES
+
+
+def get_data(count=COUNT, size=SIZE):
+    return nbody_numpy.get_data(count, size)
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    nbody_numpy.assert_result(result, count, size)
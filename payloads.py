@@ -0,0 +1,62 @@
+"""
+Payloads of various types and sizes for crossover.py, and the task that
+echoes them back from the workers.
+"""
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def make_floats(size):
+    return [float(i) for i in range(max(1, size // 8))]
+
+
+def make_array(size):
+    return array.array("d", range(max(1, size // 8)))
+
+
+def make_bytes(size):
+    return bytes(size)
+
+
+def make_dict(size):
+    # About 16 bytes of key and value per item
+    return {f"k{i:07}": f"v{i:07}" for i in range(max(1, size // 16))}
+
+
+def make_nested(size):
+    # About 64 bytes of data per record
+    return [
+        {
+            "id": i,
+            "name": f"item{i:08}",
+            "tags": ["a", "b"],
+            "point": (i * 0.5, i * 2.0),
+        }
+        for i in range(max(1, size // 64))
+    ]
+
+
+def make_numpy(size):
+    return numpy.arange(max(1, size // 8), dtype=numpy.float64)
+
+
+# Payload types, by name, and a function that makes one of roughly `size`
+# bytes of raw data
+PAYLOADS = {
+    "floats": make_floats,
+    "array": make_array,
+    "bytes": make_bytes,
+    "dict": make_dict,
+    "nested": make_nested,
+}
+if numpy is not None:
+    PAYLOADS["numpy"] = make_numpy
+
+
+def echo(payload):
+    return payload
@@ -1,13 +1,205 @@
+import argparse
 import json
+from pathlib import Path
+import statistics
 import sys
 
 from matplotlib import pyplot as plt
 
-benchmark = sys.argv[-1]
+parser = argparse.ArgumentParser(description="Plot the results of get_data.py")
+parser.add_argument("benchmark", help="The benchmark to plot")
+parser.add_argument(
+    "--gantt",
+    action="store_true",
+    help="Plot the per-task timelines in traces/ (from get_data.py --trace) "
+    "rather than the summary metrics",
+)
+parser.add_argument(
+    "--granularity",
+    action="store_true",
+    help="Plot the task size sweep in <benchmark>_granularity.json (from "
+    "get_data.py --sizes) rather than the summary metrics",
+)
+parser.add_argument(
+    "--startup",
+    action="store_true",
+    help="Plot the pool startup costs by worker count in "
+    "<benchmark>_startup.json (from get_data.py --startup) rather than the "
+    "summary metrics",
+)
+parser.add_argument(
+    "--scaling",
+    action="store_true",
+    help="Plot the worker count sweep in <benchmark>_scaling.json (from "
+    "get_data.py --sweep) rather than the summary metrics",
+)
+args = parser.parse_args()
+benchmark = args.benchmark
+
+
+def scaling_curves(ax, scaling, metric, f):
+    for i, (mode, results) in enumerate(scaling["modes"].items()):
+        points = sorted(
+            (int(workers), f(result[metric]))
+            for workers, result in results.items()
+            if metric in result
+        )
+        if points:
+            ax.plot(*zip(*points), marker="o", color=f"C{i}", label=mode)
+    ax.axvline(scaling["ncpu"], color="gray", linestyle=":", label="cores")
+    ax.set_xscale("log", base=2)
+    ax.set_xlabel("workers")
+
+
+if args.scaling:
+    scaling = json.load(open(f"{benchmark}_scaling.json"))
+    ncpu = scaling["ncpu"]
+
+    fig, axs = plt.subplots(1, 3, layout="constrained", figsize=(14, 4))
+    scaling_curves(axs[0], scaling, "speedup", lambda x: x)
+    counts = sorted(
+        {int(w) for results in scaling["modes"].values() for w in results}
+    )
+    axs[0].plot(counts, [min(n, ncpu) for n in counts], "k--", label="ideal")
+    axs[0].set_title("speedup (vs. sequential)")
+    scaling_curves(axs[1], scaling, "efficiency", lambda x: x * 100)
+    axs[1].set_title("parallel efficiency (%)")
+    scaling_curves(axs[2], scaling, "cpu", lambda x: x / ncpu)
+    axs[2].set_title("% CPU util / all cores")
+    axs[2].legend(bbox_to_anchor=(1.05, 1.0), loc="upper left")
+    plt.suptitle(f"{benchmark} scaling ({ncpu} cores)")
+    plt.savefig(f"{benchmark}_scaling.png")
+    sys.exit()
+
+if args.granularity:
+    granularity = json.load(open(f"{benchmark}_granularity.json"))
+    fig, axs = plt.subplots(1, 2, layout="constrained", figsize=(12, 4))
+    for ax, metric in zip(axs, ["compute_speedup", "speedup"]):
+        for i, (mode, results) in enumerate(granularity["modes"].items()):
+            points = sorted(
+                (int(size), result[metric])
+                for size, result in results.items()
+                if metric in result
+            )
+            if points:
+                ax.plot(*zip(*points), marker="o", color=f"C{i}", label=mode)
+        ax.axhline(1, color="gray", linestyle=":")
+        ax.set_xscale("log", base=2)
+        ax.set_yscale("log", base=2)
+        ax.set_xlabel("task size")
+    axs[0].set_title("compute speedup (vs. sequential)")
+    axs[1].set_title("wall clock speedup (vs. sequential)")
+    axs[1].legend(bbox_to_anchor=(1.05, 1.0), loc="upper left")
+    plt.suptitle(
+        f"{benchmark} task granularity ({granularity['workers']} workers, "
+        f"{granularity['ncpu']} cores)"
+    )
+    plt.savefig(f"{benchmark}_granularity.png")
+    sys.exit()
+
+# The startup metrics, their units, and how to scale them to those units
+STARTUP_METRICS = {
+    "creation": ("ms", 1e3),
+    "first_task": ("ms", 1e3),
+    "ready": ("ms", 1e3),
+    "import": ("ms", 1e3),
+    "teardown": ("ms", 1e3),
+    "memory": ("mb", 1 / 1024),
+}
+
+
+if args.startup:
+    startup = json.load(open(f"{benchmark}_startup.json"))
+    fig, axs = plt.subplots(2, 3, layout="constrained", figsize=(14, 7))
+    for ax, (metric, (unit, scale)) in zip(axs.flat, STARTUP_METRICS.items()):
+        prefix = f"startup_{metric}_"
+        for i, (mode, result) in enumerate(startup.items()):
+            points = sorted(
+                (int(key[len(prefix) :]), val * scale)
+                for key, val in result.items()
+                if key.startswith(prefix)
+            )
+            if points:
+                ax.plot(*zip(*points), marker="o", color=f"C{i}", label=mode)
+        ax.set_xscale("log", base=2)
+        ax.set_xlabel("workers")
+        ax.set_title(f"{metric} ({unit})")
+    axs[0, -1].legend(bbox_to_anchor=(1.05, 1.0), loc="upper left")
+    plt.suptitle(f"{benchmark} pool startup")
+    plt.savefig(f"{benchmark}_startup.png")
+    sys.exit()
 
 data = json.load(open(f"{benchmark}.json"))
+# Results from before the core count was recorded all came from 16 cores
+ncpu = next(iter(data.values())).get("ncpu", 16)
 
-fig, axs = plt.subplots(2, 2, layout="constrained")
+
+# A task is a straggler if it runs this many times longer than the median task
+STRAGGLER_FACTOR = 2.0
+
+
+def gantt(ax, mode, trace):
+    """
+    Plot one row per worker, with a bar for each task it ran in the timed
+    rounds. The gaps between bars are time the worker sat idle, and
+    stragglers are highlighted.
+    """
+    tasks = [
+        task for task in trace["tasks"] if task.get("timed") and "finish" in task
+    ]
+    if not tasks:
+        ax.set_title(f"{mode} (no tasks)")
+        return
+    workers = sorted({(task["pid"], task["tid"]) for task in tasks})
+    origin = min(task["enqueue"] for task in tasks)
+    end = max(task["receipt"] for task in tasks)
+    median = statistics.median(task["finish"] - task["start"] for task in tasks)
+
+    busy = 0.0
+    for row, worker in enumerate(workers):
+        bars = []
+        colors = []
+        for task in tasks:
+            if (task["pid"], task["tid"]) != worker:
+                continue
+            duration = task["finish"] - task["start"]
+            busy += duration
+            bars.append((task["start"] - origin, duration))
+            colors.append("C3" if duration > median * STRAGGLER_FACTOR else "C0")
+        ax.broken_barh(bars, (row - 0.4, 0.8), facecolors=colors)
+
+    utilization = busy / ((end - origin) * len(workers))
+    ax.set_title(f"{mode} ({utilization:.0%} utilization)")
+    ax.set_xlim(0, end - origin)
+    ax.set_yticks(range(len(workers)))
+    ax.set_yticklabels([])
+    ax.set_ylabel("worker")
+
+
+if args.gantt:
+    traces = {}
+    for mode in data:
+        path = Path("traces") / f"{benchmark}-{mode}.json"
+        if path.exists():
+            traces[mode] = json.load(open(path))
+    if not traces:
+        sys.exit(f"No traces for {benchmark} found in traces/")
+
+    fig, axs = plt.subplots(
+        len(traces),
+        1,
+        layout="constrained",
+        figsize=(8, 2 * len(traces)),
+        squeeze=False,
+    )
+    for ax, (mode, trace) in zip(axs[:, 0], traces.items()):
+        gantt(ax, mode, trace)
+    axs[-1, 0].set_xlabel("time (s)")
+    plt.suptitle(f"{benchmark} worker utilization (stragglers in red)")
+    plt.savefig(f"{benchmark}_gantt.png")
+    sys.exit()
+
+fig, axs = plt.subplots(3, 2, layout="constrained", figsize=(8, 7))
 
 
 def rotate_data(data, metric, f):
@@ -24,7 +216,17 @@ def barchart(ax, name, dataset):
     )
 
 
+def recorded(metric):
+    return any(metric in result for result in data.values())
+
+
 def plot(ax, metric, scale, f):
+    if not recorded(metric):
+        # Results from before the metric was added
+        ax.set_title(f"{metric} (not recorded)")
+        ax.set_xticks([])
+        ax.set_yticks([])
+        return
     dataset = rotate_data(data, metric, f)
     barchart(ax, metric, dataset)
     if metric == "wall_clock":
@@ -41,11 +243,27 @@ plot(
     "speedup (vs. sequential)",
     lambda x: data["sequential"]["wall_clock"] / x,
 )
-plot(axs[1, 0], "cpu", "% CPU util / all cores", lambda x: (x / 1600) * 100)
-plot(axs[1, 1], "vmpeak", "peak mem, all processes (mb)", lambda x: x / 1024)
+plot(axs[1, 0], "cpu", "% CPU util / all cores", lambda x: x / ncpu)
+if recorded("pss_peak"):
+    plot(axs[1, 1], "pss_peak", "peak PSS, all processes (mb)", lambda x: x / 1024)
+else:
+    # Results from before PSS was sampled only have the peak virtual memory
+    plot(
+        axs[1, 1],
+        "vmpeak",
+        "peak virtual mem, all processes (mb)",
+        lambda x: x / 1024,
+    )
+plot(
+    axs[2, 0],
+    "voluntary_switches",
+    "blocking context switches (thousands)",
+    lambda x: x / 1000,
+)
+plot(axs[2, 1], "run_delay", "time waiting for a CPU, all threads (s)", lambda x: x)
 
 axs[0, 1].legend(bbox_to_anchor=(1.05, 1.0), loc='upper left')
 
-plt.suptitle(f"{benchmark} benchmark (16 cores)")
+plt.suptitle(f"{benchmark} benchmark ({ncpu} cores)")
 
 plt.savefig(f"{benchmark}.png")
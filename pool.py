@@ -1,8 +1,18 @@
 import argparse
+import asyncio
 import concurrent.futures
+import functools
 from importlib.machinery import SourceFileLoader
+import itertools
+import math
+import os
 from pathlib import Path
+import pickle
+import statistics
 import sys
+import tempfile
+import threading
+import time
 
 try:
     from multiprocessing.pool import (
@@ -11,10 +21,33 @@ try:
         SubinterpreterPool3,
     )
 except ImportError:
-    pass
+    # These need the patched CPython branch (see "Running this" in the README)
+    SubinterpreterPool = SubinterpreterPool2 = SubinterpreterPool3 = None
 from multiprocessing.pool import ThreadPool
+import multiprocessing
 from multiprocessing import Pool
 
+# What the workers run lives in modules rather than here, since
+# subinterpreters and spawned workers can't unpickle functions from __main__:
+# the task wrappers of profiling, tracing and transport, the chunk runners,
+# the startup and pinning tasks, and subinterpreters' run_task. crossover.py's
+# tasks are in payloads.py for the same reason. The rest of what is imported
+# here (audit, procmon, and the Tracer and Profiler that merge the samples)
+# only runs in this process.
+from affinity import POLICIES, pin_workers
+from audit import Auditor, local_sources
+from chunking import FoldChunk, chunked, run_chunk
+from procmon import get_process_tree, sample_process
+from profiling import Profiler
+from startup import import_cost, measure_worker_startup, noop
+from subinterpreters import (
+    InterpreterExecutor,
+    interpreters,
+    shm_breaks_interp_stock,
+)
+from tracing import Tracer, percentile
+from transport import TRANSPORTS, PickleTransport
+
 gilknocker = None
 try:
     if not getattr(sys.flags, "nogil", False):
@@ -23,32 +56,701 @@ except ImportError:
     pass
 
 
-BENCHMARKS = ["nbody", "nbody_no_share", "data_pass", "raytrace", "fib", "fib2"]
+BENCHMARKS = [
+    "balance",
+    "nbody",
+    "nbody_no_share",
+    "nbody_numpy",
+    "nbody_numpy_split",
+    "data_pass",
+    "data_pass_array",
+    "raytrace",
+    "raytrace_compact",
+    "raytrace_tiles",
+    "raytrace_spheres",
+    "raytrace_bvh",
+    "fib",
+    "fib2",
+]
+
+# In auto mode, aim for dispatch overhead of at most this fraction of the
+# compute time of each chunk.
+CHUNKSIZE_OVERHEAD_TARGET = 0.05
+
+
+def parse_chunksize(value):
+    if value == "auto":
+        return value
+    chunksize = int(value)
+    if chunksize < 1:
+        raise argparse.ArgumentTypeError("chunksize must be >= 1 or 'auto'")
+    return chunksize
 
 
-def get_multiprocessing_runner(pool_type):
-    def multiprocessing_runner(nworkers, func, data):
-        with pool_type(nworkers) as p:
-            return list(p.map(func, data))
+class SequentialPool:
+    """
+    Runs the tasks one at a time in the calling thread, with the same
+    interface as `multiprocessing.Pool`.
+    """
 
-    return multiprocessing_runner
+    def __init__(self, nworkers):
+        pass
 
+    def __enter__(self):
+        return self
 
-def get_sequential_runner():
-    def sequential_runner(nworkers, func, data):
+    def __exit__(self, *exc_info):
+        pass
+
+    def map(self, func, data, chunksize=None):
         return list(map(func, data))
 
-    return sequential_runner
+    def imap_unordered(self, func, data, chunksize=None, inflight=None):
+        return map(func, data)
+
+
+class ExecutorPool:
+    """
+    Adapts a `concurrent.futures` executor to the `multiprocessing.Pool`
+    interface. Each chunk of tasks is a single `executor.submit` call.
+    """
+
+    def __init__(self, nworkers, executor_type=concurrent.futures.ThreadPoolExecutor):
+        self.executor = executor_type(max_workers=nworkers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.executor.shutdown()
+
+    def map(self, func, data, chunksize=1):
+        futures = [
+            self.executor.submit(run_chunk, func, *chunk)
+            for chunk in chunked(data, chunksize)
+        ]
+        concurrent.futures.wait(futures)
+        return [x for future in futures for x in future.result()]
+
+    def imap_unordered(self, func, data, chunksize=1, inflight=None):
+        # Since the tasks are submitted from the consuming thread, the number
+        # of tasks in flight is bounded here rather than by `stream`.
+        if inflight is None:
+            inflight = self.executor._max_workers * 4
+        max_pending = max(1, inflight // chunksize)
+        chunks = chunked(data, chunksize)
+        pending = set()
+        while True:
+            for chunk in itertools.islice(chunks, max_pending - len(pending)):
+                pending.add(self.executor.submit(run_chunk, func, *chunk))
+            if not pending:
+                return
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                yield from future.result()
+
+
+class PoolExecutor(concurrent.futures.Executor):
+    """
+    Adapts a `multiprocessing.Pool`-style pool (e.g. `SubinterpreterPool`) to
+    the `concurrent.futures.Executor` interface, so that it can be used with
+    `loop.run_in_executor`.
+    """
+
+    def __init__(self, max_workers, pool_type):
+        self._max_workers = max_workers
+        self.pool = pool_type(max_workers)
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        self.pool.apply_async(
+            fn,
+            args,
+            kwargs,
+            callback=future.set_result,
+            error_callback=future.set_exception,
+        )
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.pool.close()
+        if wait:
+            self.pool.join()
+
+
+class LoopLag:
+    """
+    Measures how late the event loop wakes up from short sleeps, while the
+    pool is busy. This is how long any other coroutine on the loop would be
+    held up by the offloading (or by the caller handling results on the
+    loop's thread). Only the timed rounds are sampled, not the startup
+    barrier, chunksize calibration or warmup.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = []
+        self.timed = False
+
+    def start_round(self, timed=True):
+        self.timed = timed
+
+    async def monitor(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            if self.timed:
+                self.samples.append(loop.time() - start - self.interval)
+
+    def summary(self):
+        if not self.samples:
+            return {}
+        return {
+            "loop_lag_p50": percentile(self.samples, 50),
+            "loop_lag_p99": percentile(self.samples, 99),
+            "loop_lag_max": max(self.samples),
+        }
+
+
+class AsyncioPool(ExecutorPool):
+    """
+    Drives an executor from an asyncio event loop, the way code in an async
+    application would offload work: each chunk of tasks is one
+    `loop.run_in_executor` call (which is also what `asyncio.to_thread` does
+    on the default thread executor), and at most `limit` of them are
+    outstanding at a time, bounded by an `asyncio.Semaphore`.
+    """
+
+    def __init__(self, nworkers, executor_type, limit=None, lag=None):
+        super().__init__(nworkers, executor_type)
+        self.loop = asyncio.new_event_loop()
+        self.limit = limit if limit is not None else nworkers * 4
+        self.lag = lag if lag is not None else LoopLag()
+        self.semaphore = None
+
+    def __exit__(self, *exc_info):
+        super().__exit__(*exc_info)
+        self.loop.close()
+
+    async def run_chunk(self, func, chunk):
+        if self.semaphore is None:
+            # Created lazily, so that it belongs to this loop
+            self.semaphore = asyncio.Semaphore(self.limit)
+        async with self.semaphore:
+            return await self.loop.run_in_executor(
+                self.executor, run_chunk, func, *chunk
+            )
+
+    def run(self, coro):
+        """Run `coro` on the loop, monitoring the loop lag meanwhile."""
+
+        async def monitored():
+            monitor = asyncio.create_task(self.lag.monitor())
+            try:
+                return await coro
+            finally:
+                monitor.cancel()
+
+        return self.loop.run_until_complete(monitored())
+
+    def map(self, func, data, chunksize=1):
+        async def map_chunks():
+            return await asyncio.gather(
+                *(self.run_chunk(func, chunk) for chunk in chunked(data, chunksize))
+            )
+
+        return [x for chunk in self.run(map_chunks()) for x in chunk]
+
+    def imap_unordered(self, func, data, chunksize=1, inflight=None):
+        if inflight is None:
+            inflight = self.limit
+        max_pending = max(1, inflight // chunksize)
+        chunks = chunked(data, chunksize)
+        pending = set()
+        while True:
+            for chunk in itertools.islice(chunks, max_pending - len(pending)):
+                pending.add(self.loop.create_task(self.run_chunk(func, chunk)))
+            if not pending:
+                return
+            done, pending = self.run(
+                asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            )
+            for task in done:
+                yield from task.result()
+
+
+def get_executor_type(mode, start_method=None, preload=()):
+    """
+    The executor that the asyncio variant of `mode` offloads tasks to.
+    """
+    if mode == "thread":
+        return concurrent.futures.ThreadPoolExecutor
+    elif mode == "subprocess":
+        ctx = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            ctx.set_forkserver_preload(list(preload))
+        return functools.partial(concurrent.futures.ProcessPoolExecutor, mp_context=ctx)
+    elif mode in ("interp", "interp2"):
+        return functools.partial(PoolExecutor, pool_type=get_pool_type(mode))
+    elif mode == "interp-stock":
+        return InterpreterExecutor
+
+
+def get_pool_type(mode, start_method=None, preload=()):
+    """
+    `start_method` selects how subprocess workers are started. With
+    `forkserver`, the modules in `preload` are imported once in the fork
+    server, so every worker starts with them (and their globals) ready.
+    """
+    if mode == "interp":
+        return SubinterpreterPool
+    elif mode == "interp2":
+        return SubinterpreterPool2
+    elif mode == "thread":
+        return ThreadPool
+    elif mode == "subprocess":
+        if start_method is None:
+            return Pool
+        ctx = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            ctx.set_forkserver_preload(list(preload))
+        return ctx.Pool
+    elif mode == "sequential":
+        return SequentialPool
+    elif mode == "futures":
+        return ExecutorPool
+    elif mode == "interp-stock":
+        return functools.partial(ExecutorPool, executor_type=InterpreterExecutor)
+
+
+def tree_reduce(merge, partials, initial):
+    """
+    Merges the partial aggregates pairwise, in rounds, as a balanced tree,
+    with `merge(left, right)`.
+    """
+    partials = list(partials)
+    if not partials:
+        return initial
+    while len(partials) > 1:
+        merged = [merge(a, b) for a, b in zip(partials[::2], partials[1::2])]
+        if len(partials) % 2:
+            merged.append(partials[-1])
+        partials = merged
+    return partials[0]
+
+
+def map_reduce(pool, func, data, combine, initial, merge=None, chunksize=1):
+    """
+    Runs `func` on each element of `data` in `pool`, and returns the results
+    reduced to one aggregate.
+
+    Each worker folds the results of a chunk of `chunksize` elements with
+    `combine(aggregate, result)`, starting from `initial`, so that only the
+    partial aggregates are sent back, and the parent finishes with a tree of
+    `merge(aggregate, aggregate)`. `merge` defaults to `combine`, for
+    aggregates of the same type as the results (e.g. sums).
+    """
+    fold = FoldChunk(func, combine, initial)
+    partials = pool.map(fold, list(chunked(data, chunksize)), 1)
+    return tree_reduce(merge or combine, partials, initial)
+
+
+class ResultBytes:
+    """
+    Measures the pickled size of the results of each round, as received from
+    the workers: what crosses a process or interpreter boundary (or would,
+    for threads). The time spent pickling them is kept in `overhead`, so that
+    it can be left out of the round's time.
+    """
+
+    def __init__(self):
+        self.nbytes = 0
+        self.overhead = 0.0
+
+    def start_round(self):
+        self.nbytes = 0
+        self.overhead = 0.0
+
+    def size(self, result):
+        start = time.perf_counter()
+        self.nbytes += len(pickle.dumps(result, 5))
+        self.overhead += time.perf_counter() - start
+        return result
+
+    def receive(self, results):
+        return [self.size(x) for x in results]
+
+    def stream(self, results):
+        for x in results:
+            yield self.size(x)
+
+
+def stream(pool, func, data, chunksize, inflight):
+    """
+    Yield results in completion order, pulling tasks lazily from `data` so
+    that at most `inflight` of them are queued or running at a time.
+    """
+    if isinstance(pool, (SequentialPool, ExecutorPool)):
+        yield from pool.imap_unordered(func, data, chunksize, inflight)
+        return
+
+    # multiprocessing.Pool consumes its input eagerly in its task handler
+    # thread, so hold that thread back until results are received.
+    gate = threading.Semaphore(inflight)
+    closed = threading.Event()
+
+    def gated(data):
+        for elem in data:
+            gate.acquire()
+            if closed.is_set():
+                return
+            yield elem
+
+    try:
+        for result in pool.imap_unordered(func, gated(data), chunksize):
+            gate.release()
+            yield result
+    finally:
+        # If a task or the consumer failed, the task handler may be blocked on
+        # the gate, and terminating the pool would wait for it forever
+        closed.set()
+        gate.release()
+
+
+def schedule_order(schedule, data, task_cost=None):
+    """
+    Returns the order in which to dispatch the tasks in `data`, as a list of
+    indices, or None to dispatch them as they are.
+
+    - static: `data` is split into fixed chunks up front, as `Pool.map` does.
+    - dynamic: tasks are handed out one at a time to whichever worker is
+      idle, so one worker stuck on an expensive task doesn't hold back the
+      rest of its chunk.
+    - ljf: dynamic, but dispatching the most expensive tasks first (according
+      to the benchmark's `task_cost`), so that the stragglers start early
+      and cheap tasks fill in the gaps at the end.
+    """
+    if schedule == "static":
+        return None
+    order = list(range(len(data)))
+    if schedule == "ljf":
+        order.sort(key=lambda i: task_cost(data[i]), reverse=True)
+    return order
+
+
+def unschedule(order, results):
+    if order is None:
+        return results
+    unordered = [None] * len(results)
+    for i, result in zip(order, results):
+        unordered[i] = result
+    return unordered
+
+
+def default_chunksize(pool, nworkers, ntasks):
+    if isinstance(pool, ExecutorPool):
+        # Historically, the executor was sent each element on its own
+        return 1
+    # The same heuristic multiprocessing.Pool.map uses when no chunksize is
+    # given: about four chunks per worker.
+    chunksize, extra = divmod(ntasks, nworkers * 4)
+    if extra:
+        chunksize += 1
+    return max(1, chunksize)
+
+
+def calibrate_chunksize(pool, nworkers, func, sample, ntasks):
+    """
+    Pick a chunksize from a short probe of the pool.
+
+    The per-dispatch overhead is measured by sending trivial tasks through the
+    pool one at a time, and the per-task cost by running one real task
+    in-process. The chunk is made large enough to amortize the dispatch
+    overhead, but never so large that the workers can't be load balanced.
+    """
+    probe = list(range(nworkers * 4))
+    start = time.perf_counter()
+    pool.map(abs, probe, 1)
+    dispatch_cost = (time.perf_counter() - start) / len(probe)
+
+    start = time.perf_counter()
+    func(sample)
+    task_cost = time.perf_counter() - start
+
+    needed = math.ceil(dispatch_cost / (task_cost * CHUNKSIZE_OVERHEAD_TARGET))
+    return max(1, min(needed, default_chunksize(None, nworkers, ntasks)))
+
+
+def resolve_chunksize(chunksize, pool, nworkers, func, sample, ntasks):
+    """
+    `sample` is one task's input, used for calibration, and `ntasks` is the
+    number of tasks the chunks are load balanced over.
+    """
+    if isinstance(pool, SequentialPool):
+        return None
+    if chunksize == "auto":
+        chunksize = calibrate_chunksize(pool, nworkers, func, sample, ntasks)
+    elif chunksize is None:
+        chunksize = default_chunksize(pool, nworkers, ntasks)
+    print(f"chunksize: {chunksize}")
+    return chunksize
+
+
+class HarnessPool:
+    """
+    Wraps `pool` to run `map` through the tracer, transport, sizer and
+    profiler, so that `map_reduce` can drive it like any other pool.
+    """
+
+    def __init__(
+        self, pool, transport, receiver, timed, tracer=None, sizer=None, profiler=None
+    ):
+        self.pool = pool
+        self.transport = transport
+        self.receiver = receiver
+        self.timed = timed
+        self.tracer = tracer
+        self.sizer = sizer
+        self.profiler = profiler
+
+    def wrap(self, func):
+        if self.profiler is not None:
+            func = self.profiler.wrap(func)
+        func = self.transport.wrap(func)
+        if self.tracer is not None:
+            func = self.tracer.wrap(func)
+        return func
+
+    def map(self, func, inputs, chunksize):
+        if self.tracer is not None:
+            inputs = self.tracer.start_round(inputs, self.timed)
+        results = self.pool.map(self.wrap(func), inputs, chunksize)
+        if self.tracer is not None:
+            results = self.tracer.receive(results)
+        if self.sizer is not None:
+            results = self.sizer.receive(results)
+        results = self.receiver(results)
+        if self.profiler is not None:
+            results = self.profiler.receive(results)
+        return results
 
 
-def get_threadpool_executor_runner():
-    def threadpool_executor_runner(nworkers, func, data):
-        with concurrent.futures.ThreadPoolExecutor(max_workers=nworkers) as executor:
-            futures = [executor.submit(func, elem) for elem in data]
-            concurrent.futures.wait(futures)
-            return [x.result() for x in futures]
+def run_harness(
+    pool_type,
+    nworkers,
+    func,
+    get_data,
+    check,
+    chunksize=None,
+    warmup=0,
+    repeat=1,
+    transport=PickleTransport,
+    inflight=None,
+    tracer=None,
+    schedule="static",
+    task_cost=None,
+    profiler=None,
+    pin="none",
+    sizer=None,
+    reduce=None,
+):
+    """
+    Create the pool once, then run `warmup` untimed rounds followed by
+    `repeat` timed rounds of the benchmark against the same warm pool.
 
-    return threadpool_executor_runner
+    If `inflight` is given, each round streams the tasks from `get_data()`
+    with at most `inflight` of them in flight, and `check` consumes the
+    results incrementally as they complete. Otherwise, the data and the
+    results are materialized as lists.
+
+    If a `tracing.Tracer` is given, each task is traced. If a
+    `profiling.Profiler` is given, each task's stacks are sampled.
+
+    `schedule` is one of the policies described in `schedule_order`. The
+    dynamic schedules default to a chunksize of 1.
+
+    `pin` is one of the `affinity.POLICIES` for placing the workers on CPUs.
+
+    If a `ResultBytes` is given, the size of the results is measured, and the
+    time that takes is left out of the compute times.
+
+    If `reduce` is given, as `(combine, initial, merge)`, each round runs
+    `map_reduce` with chunks of `chunksize` tasks, and `check` is passed the
+    final aggregate. The merge in the parent is part of the compute time.
+
+    Returns the time taken to create the pool, the time until all of its
+    workers were ready to run tasks (None for the sequential pool), and the
+    list of per-round compute times. In streaming mode, the compute time
+    includes `check`, since it is interleaved with the tasks.
+    """
+    start = time.perf_counter()
+    with pool_type(nworkers) as p:
+        pool_creation = time.perf_counter() - start
+        if isinstance(p, SequentialPool):
+            worker_startup = None
+        else:
+            worker_startup = measure_worker_startup(p, nworkers, start)
+        if pin != "none":
+            # The sequential pool runs its tasks in this thread
+            cpus = pin_workers(p, 1 if isinstance(p, SequentialPool) else nworkers, pin)
+            print(f"pinned_cpus: {','.join(map(str, cpus))}")
+
+        if inflight is None:
+            data = list(get_data())
+            order = schedule_order(schedule, data, task_cost)
+            if order is not None:
+                data = [data[i] for i in order]
+                if chunksize is None:
+                    chunksize = 1
+            chunksize = resolve_chunksize(
+                chunksize, p, nworkers, func, data[0], len(data)
+            )
+        else:
+            sample = next(iter(get_data()))
+            chunksize = resolve_chunksize(
+                chunksize, p, nworkers, func, sample, inflight
+            )
+            # Make sure there is room for at least one whole chunk
+            inflight = max(inflight, chunksize or 1)
+            print(f"inflight: {inflight}")
+
+        def run_round(timed):
+            start = time.perf_counter()
+            if profiler is not None:
+                profiler.start_round(timed)
+            if sizer is not None:
+                sizer.start_round()
+            if isinstance(p, AsyncioPool):
+                p.lag.start_round(timed)
+            with transport.receiver() as receiver:
+                pool = HarnessPool(
+                    p, transport, receiver, timed, tracer, sizer, profiler
+                )
+                if inflight is None:
+                    if reduce is not None:
+                        result = map_reduce(pool, func, data, *reduce, chunksize)
+                    else:
+                        results = pool.map(func, data, chunksize)
+                        result = unschedule(order, results)
+                        del results
+                    elapsed = time.perf_counter() - start
+                    check(result)
+                    del result
+                else:
+                    inputs = iter(get_data())
+                    if tracer is not None:
+                        inputs = tracer.start_round(inputs, timed)
+                    streamed = results = stream(
+                        p, pool.wrap(func), inputs, chunksize, inflight
+                    )
+                    if tracer is not None:
+                        results = tracer.stream(results)
+                    if sizer is not None:
+                        results = sizer.stream(results)
+                    results = receiver.stream(results)
+                    if profiler is not None:
+                        results = profiler.stream(results)
+                    try:
+                        check(results)
+                    finally:
+                        # Release the pool's task handler even if check failed
+                        streamed.close()
+                    elapsed = time.perf_counter() - start
+            if sizer is not None:
+                elapsed -= sizer.overhead
+            return elapsed
+
+        for _ in range(warmup):
+            run_round(False)
+
+        timings = [run_round(True) for _ in range(repeat)]
+
+    return pool_creation, worker_startup, timings
+
+
+def tree_pss():
+    """The PSS of this process and all of its children, in kB."""
+    samples = (sample_process(pid) for pid in get_process_tree(os.getpid()))
+    return sum(sample["pss"] for sample in samples if sample is not None)
+
+
+def startup_counts(max_workers):
+    """Powers of two up to `max_workers`, and `max_workers` itself."""
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def run_startup_suite(pool_type, max_workers, module_path, repeat=1):
+    """
+    Measure what it costs to stand up a pool of each of `startup_counts`
+    workers, with no benchmark tasks, `repeat` times each:
+
+      - creation: the time to create the pool.
+      - first_task: the round trip time of one task on the new pool, which
+        includes starting its first worker if the pool starts them lazily.
+      - ready: the time from starting to create the pool until all of its
+        workers were running tasks.
+      - import: the time to execute the module at `module_path` in a worker
+        (the slowest of them).
+      - teardown: the time to shut the pool down.
+      - memory: the PSS of the process tree, in kB, with the workers up and
+        the module imported in each, over the PSS before creating the pool.
+
+    Returns a dict of the medians of each, by worker count, and the memory
+    per worker: the slope of a least-squares fit of memory to worker count.
+    """
+    results = {}
+    for nworkers in startup_counts(max_workers):
+        runs = []
+        for _ in range(repeat):
+            before = tree_pss()
+            start = time.perf_counter()
+            with pool_type(nworkers) as p:
+                created = time.perf_counter()
+                p.map(noop, [None], 1)
+                first_task = time.perf_counter() - created
+                ready = measure_worker_startup(p, nworkers, start)
+                with tempfile.TemporaryDirectory() as directory:
+                    imports = p.map(
+                        import_cost, [(directory, nworkers, module_path)] * nworkers, 1
+                    )
+                memory = tree_pss() - before
+                stopping = time.perf_counter()
+            runs.append(
+                {
+                    "creation": created - start,
+                    "first_task": first_task,
+                    "ready": ready,
+                    "import": max(imports),
+                    "teardown": time.perf_counter() - stopping,
+                    "memory": memory,
+                }
+            )
+        results[nworkers] = {
+            key: statistics.median(run[key] for run in runs) for key in runs[0]
+        }
+
+    counts = list(results)
+    memory = [results[n]["memory"] for n in counts]
+    if len(counts) > 1:
+        # statistics.linear_regression is 3.10+, and nogil is 3.9
+        mean_n = statistics.mean(counts)
+        mean_memory = statistics.mean(memory)
+        per_worker = sum(
+            (n - mean_n) * (m - mean_memory) for n, m in zip(counts, memory)
+        ) / sum((n - mean_n) ** 2 for n in counts)
+    else:
+        per_worker = memory[0] / counts[0]
+    return results, per_worker
 
 
 # TODO: Import __main__ into the subinterpreter so it can access f and it
@@ -60,7 +762,15 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "mode",
-        choices=["interp", "interp2", "thread", "subprocess", "sequential", "futures"],
+        choices=[
+            "interp",
+            "interp2",
+            "interp-stock",
+            "thread",
+            "subprocess",
+            "sequential",
+            "futures",
+        ],
         help="Type of pool to use",
     )
     parser.add_argument("benchmark", choices=BENCHMARKS, help="The benchmark to run")
@@ -71,40 +781,294 @@ if __name__ == "__main__":
         help="The number of workers to run",
         default=16,
     )
+    parser.add_argument(
+        "--chunksize",
+        type=parse_chunksize,
+        help="The number of tasks sent to a worker at a time, or 'auto' to "
+        "calibrate it from the cost of the tasks",
+        default=None,
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        help="The number of untimed rounds to run on the pool before measuring",
+        default=0,
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="The number of timed rounds to run on the same pool",
+        default=1,
+    )
+    parser.add_argument(
+        "--transport",
+        choices=list(TRANSPORTS),
+        help="How results are sent back from the workers",
+        default="pickle",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream tasks and results through the pool rather than "
+        "materializing them as lists",
+    )
+    parser.add_argument(
+        "--inflight",
+        type=int,
+        help="In streaming mode, the maximum number of tasks in flight "
+        "(default: 4 per worker)",
+        default=None,
+    )
+    parser.add_argument(
+        "--trace",
+        help="Write a per-task timeline (in Chrome's trace event format) and "
+        "latency histograms to this JSON file",
+        default=None,
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=["static", "dynamic", "ljf"],
+        help="How tasks are assigned to workers: in fixed chunks (static), one "
+        "at a time to idle workers (dynamic), or one at a time, longest job "
+        "first (ljf)",
+        default="static",
+    )
+    parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        help="Dispatch the tasks from an asyncio event loop through "
+        "loop.run_in_executor, to the thread, process or subinterpreter "
+        "executor for the mode",
+    )
+    parser.add_argument(
+        "--async-limit",
+        type=int,
+        help="With --asyncio, the maximum number of run_in_executor calls "
+        "outstanding at a time (default: 4 per worker)",
+        default=None,
+    )
+    parser.add_argument(
+        "--start-method",
+        choices=multiprocessing.get_all_start_methods(),
+        help="How subprocess workers are started. With forkserver, the "
+        "benchmark module is preloaded in the fork server.",
+        default=None,
+    )
+    parser.add_argument(
+        "--profile",
+        help="Sample the stacks of the tasks inside every worker, and write "
+        "them merged to this file in collapsed-stack (flamegraph) format",
+        default=None,
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        help="The number of tasks (default: the benchmark's COUNT)",
+        default=None,
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        help="The size of each task, e.g. the fibonacci depth, the nbody "
+        "loops or the raytrace image width (default: the benchmark's SIZE)",
+        default=None,
+    )
+    parser.add_argument(
+        "--reduce",
+        action="store_true",
+        help="Fold the results in the workers with the benchmark's combine "
+        "hook, one chunk of tasks at a time (chunked as without --reduce), and "
+        "send back only the partial aggregates, which are merged in the parent",
+    )
+    parser.add_argument(
+        "--result-bytes",
+        action="store_true",
+        help="Report the pickled size of the results sent back in a round",
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="Rather than running the benchmark, measure the creation, "
+        "first-task latency, teardown, memory and benchmark module import cost "
+        "of pools of 1, 2, 4, ... up to --workers workers (--repeat times each)",
+    )
+    parser.add_argument(
+        "--pin",
+        choices=POLICIES,
+        help="How to pin the workers (processes, threads, or the threads "
+        "behind subinterpreters) to CPUs",
+        default="none",
+    )
+    parser.add_argument(
+        "--audit",
+        help="Trace the benchmark's code in the worker threads, and write a "
+        "report of the objects written by one thread and accessed by another "
+        "to this file. Slow: audit small runs.",
+        default=None,
+    )
     args = parser.parse_args()
+    if args.startup and args.mode == "sequential":
+        parser.error("--startup needs a mode with workers")
+    if args.pin != "none" and not hasattr(os, "sched_setaffinity"):
+        parser.error("--pin needs os.sched_setaffinity, which is Linux-only")
+    if args.audit is not None and args.mode not in ("thread", "futures"):
+        parser.error("--audit needs a mode whose workers are threads")
+    if args.start_method is not None and args.mode != "subprocess":
+        parser.error("--start-method only applies to the subprocess mode")
+    if args.stream and args.schedule != "static":
+        parser.error("--stream already dispatches tasks dynamically, in order")
+    if args.inflight is None:
+        args.inflight = args.workers * 4
+    if args.mode in ("interp", "interp2") and SubinterpreterPool is None:
+        parser.error(
+            f"{args.mode} needs a CPython branch with SubinterpreterPool; "
+            "interp-stock runs on a stock CPython 3.12+"
+        )
+    if args.mode == "interp-stock":
+        if interpreters is None:
+            parser.error("interp-stock needs the subinterpreters API of CPython 3.12+")
+        if shm_breaks_interp_stock(args.transport):
+            parser.error("--transport shm needs CPython 3.13+ with interp-stock")
+    if args.asyncio and args.mode not in (
+        "thread",
+        "subprocess",
+        "interp",
+        "interp2",
+        "interp-stock",
+    ):
+        parser.error("--asyncio needs a thread, subprocess or interp mode")
+    if args.async_limit is not None and args.async_limit < args.workers:
+        # Otherwise, the workers can't all be busy at once to measure startup
+        parser.error("--async-limit must be at least the number of workers")
 
     module = SourceFileLoader(
         args.benchmark, str(Path(__file__).parent / f"{args.benchmark}.py")
     ).load_module()
+    # The benchmark's number of tasks and size of each, unless overridden
+    count = module.COUNT if args.count is None else args.count
+    size = module.SIZE if args.size is None else args.size
     bench_func, bench_data, bench_assert = (
         module.bench,
-        module.get_data,
-        module.assert_result,
-    )
-
-    single = False
-    if args.mode == "interp":
-        runner = get_multiprocessing_runner(SubinterpreterPool)
-    elif args.mode == "interp2":
-        runner = get_multiprocessing_runner(SubinterpreterPool2)
-    elif args.mode == "thread":
-        runner = get_multiprocessing_runner(ThreadPool)
-    elif args.mode == "subprocess":
-        runner = get_multiprocessing_runner(Pool)
-    elif args.mode == "sequential":
-        runner = get_sequential_runner()
-    elif args.mode == "futures":
-        runner = get_threadpool_executor_runner()
+        functools.partial(module.get_data, count, size),
+        functools.partial(module.assert_result, count=count, size=size),
+    )
+    if args.schedule == "ljf" and not hasattr(module, "task_cost"):
+        parser.error(f"{args.benchmark} doesn't define task_cost for ljf scheduling")
+    if args.reduce:
+        if not hasattr(module, "combine"):
+            parser.error(f"{args.benchmark} doesn't define combine for --reduce")
+        if args.chunksize == "auto" or args.schedule == "ljf" or args.stream:
+            parser.error(
+                "--reduce sends whole chunks as tasks, so it can't be combined "
+                "with --chunksize auto, --schedule ljf or --stream"
+            )
+
+    if args.asyncio:
+        lag = LoopLag()
+        pool_type = functools.partial(
+            AsyncioPool,
+            executor_type=get_executor_type(
+                args.mode, args.start_method, [args.benchmark]
+            ),
+            limit=args.async_limit,
+            lag=lag,
+        )
+    else:
+        lag = None
+        pool_type = get_pool_type(args.mode, args.start_method, [args.benchmark])
+    reduce = None
+    if args.reduce:
+        reduce = (module.combine, module.INITIAL, getattr(module, "merge", None))
+        bench_assert = functools.partial(
+            module.assert_reduced, count=count, size=size
+        )
 
+    if args.startup:
+        results, per_worker = run_startup_suite(
+            pool_type, args.workers, module.__file__, args.repeat
+        )
+        for nworkers, result in results.items():
+            for key, val in result.items():
+                print(f"startup_{key}_{nworkers}: {val}")
+        print(f"startup_memory_per_worker: {per_worker}")
+        sys.exit()
+
+    tracer = Tracer() if args.trace is not None else None
+    profiler = Profiler() if args.profile is not None else None
+    sizer = ResultBytes() if args.result_bytes else None
+    auditor = None
+    if args.audit is not None:
+        auditor = Auditor(local_sources(module.__file__))
+
+    if auditor is not None:
+        # Only the threads started from here on are traced: the pool's workers
+        auditor.start()
     if gilknocker is not None:
         knocker = gilknocker.KnockKnock(1_000)
         knocker.start()
 
-    result = runner(args.workers, bench_func, bench_data())
-    bench_assert(result)
+    pool_creation, worker_startup, timings = run_harness(
+        pool_type,
+        args.workers,
+        bench_func,
+        bench_data,
+        bench_assert,
+        chunksize=args.chunksize,
+        warmup=args.warmup,
+        repeat=args.repeat,
+        transport=TRANSPORTS[args.transport],
+        inflight=args.inflight if args.stream else None,
+        tracer=tracer,
+        schedule=args.schedule,
+        task_cost=getattr(module, "task_cost", None),
+        profiler=profiler,
+        pin=args.pin,
+        sizer=sizer,
+        reduce=reduce,
+    )
 
+    if auditor is not None:
+        auditor.stop()
     if gilknocker is not None:
         knocker.stop()
         print(f"gilknocker: {knocker.contention_metric}")
     elif "nogil" in sys.version:
         print(f"gilknocker: 0")
+
+    print(f"pin: {args.pin}")
+    print(f"task_count: {count}")
+    print(f"task_size: {size}")
+    print(f"pool_creation: {pool_creation}")
+    if worker_startup is not None:
+        print(f"worker_startup: {worker_startup}")
+    print(f"compute_min: {min(timings)}")
+    print(f"compute_median: {statistics.median(timings)}")
+    print(f"compute_stddev: {statistics.stdev(timings) if len(timings) > 1 else 0.0}")
+
+    if tracer is not None:
+        tracer.write(args.trace)
+        for key, val in tracer.summary().items():
+            print(f"{key}: {val}")
+
+    if profiler is not None:
+        if profiler.nsamples():
+            profiler.write(args.profile)
+        else:
+            print(
+                f"Not writing {args.profile}: no samples were taken, the timed "
+                "rounds may be shorter than the sampling interval",
+                file=sys.stderr,
+            )
+        print(f"profile_samples: {profiler.nsamples()}")
+
+    if sizer is not None:
+        print(f"result_bytes: {sizer.nbytes}")
+
+    if auditor is not None:
+        races, shared_reads = auditor.write(args.audit)
+        print(f"audit_races: {len(races)}")
+        print(f"audit_shared_reads: {len(shared_reads)}")
+
+    if lag is not None:
+        for key, val in lag.summary().items():
+            print(f"{key}: {val}")
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+"""
+Run a command and sample the memory usage and scheduler statistics of its
+whole process tree.
+
+Every process in the tree is sampled from /proc/<pid>/smaps_rollup and
+/proc/<pid>/status directly (no fork+exec per sample), recording:
+
+  - rss: resident set size. Overcounts memory shared between processes, such
+    as copy-on-write pages in forked workers.
+  - pss: proportional set size. Shared pages are divided between the
+    processes sharing them, so PSS can be summed across processes.
+  - uss: unique set size. Pages private to the process: what would be freed
+    if it exited.
+
+The kernel's own high-water mark (VmHWM) is also read, so short RSS spikes
+between samples are still caught for each process.
+
+Every thread of every process is also sampled, less often, from
+/proc/<pid>/task/<tid>/stat, status and schedstat, recording its cumulative:
+
+  - user_time, system_time: CPU time in user space and in the kernel.
+  - voluntary_switches: how often it blocked, e.g. waiting on a lock or I/O.
+    Lock convoys show up as many of these.
+  - involuntary_switches: how often it was preempted.
+  - run_delay: time spent runnable but waiting on a run queue for a CPU.
+
+The per-thread counters are written with -o. Sampling misses each thread's
+last interval, and threads shorter than an interval entirely, so the totals
+of the CPU times and context switches are taken from the command's rusage
+once it exits instead, which covers every thread of every process in the tree
+that was waited for. The total run_delay is over all threads, as of each
+thread's last sample.
+
+Peaks are reported on stderr for the whole tree, for the parent (the first
+Python process in the tree, so wrappers like /usr/bin/time are skipped) and
+for the largest worker (any process below the parent). Threads and
+subinterpreters live in the parent's process, so their memory is part of the
+parent's. With -o, the per-process time series are written to a JSON file.
+
+Usage: procmon.py [-i interval] [-s sched-interval] [-o series.json] command [args...]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+# Only kernels built with CONFIG_SCHED_INFO have schedstat
+HAS_SCHEDSTAT = os.path.exists("/proc/self/schedstat")
+
+SCHED_KEYS = (
+    "user_time",
+    "system_time",
+    "voluntary_switches",
+    "involuntary_switches",
+    "run_delay",
+)
+
+
+def read_smaps_rollup(pid):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fd:
+            lines = fd.readlines()
+    except FileNotFoundError:
+        # Kernels older than 4.14 don't have smaps_rollup
+        with open(f"/proc/{pid}/smaps") as fd:
+            lines = fd.readlines()
+
+    fields = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB":
+            key = parts[0][:-1]
+            fields[key] = fields.get(key, 0) + int(parts[1])
+    return fields
+
+
+def read_status(path):
+    fields = {}
+    with open(f"{path}/status") as fd:
+        for line in fd:
+            key, _, val = line.partition(":")
+            fields[key] = val.strip()
+    return fields
+
+
+def read_stat(path):
+    """Returns the fields of a stat file after the command name."""
+    with open(f"{path}/stat") as fd:
+        stat = fd.read()
+    # The command name may contain spaces, so split after its closing paren
+    return stat[stat.rindex(")") + 2 :].split()
+
+
+def read_ppid(pid):
+    return int(read_stat(f"/proc/{pid}")[1])
+
+
+def get_process_tree(root):
+    """Returns the pids of `root` and all of its descendants, parents first."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            children.setdefault(read_ppid(int(entry)), []).append(int(entry))
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+
+    tree = [root]
+    for pid in tree:
+        tree.extend(sorted(children.get(pid, [])))
+    return tree
+
+
+def sample_process(pid):
+    """
+    Returns a dict of memory usage (in kB) for the process, or None if it
+    has already exited.
+    """
+    try:
+        smaps = read_smaps_rollup(pid)
+        status = read_status(f"/proc/{pid}")
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    return {
+        "rss": smaps.get("Rss", 0),
+        "pss": smaps.get("Pss", 0),
+        "uss": smaps.get("Private_Clean", 0) + smaps.get("Private_Dirty", 0),
+        "hwm": int(status.get("VmHWM", "0 kB").split()[0]),
+        "name": status.get("Name", ""),
+        "threads": int(status.get("Threads", 0)),
+    }
+
+
+def sample_thread(pid, tid):
+    """
+    Returns a dict of the scheduler counters of the thread, cumulative since
+    it started (times in seconds), or None if it has already exited.
+    """
+    path = f"/proc/{pid}/task/{tid}"
+    try:
+        stat = read_stat(path)
+        status = read_status(path)
+        if HAS_SCHEDSTAT:
+            with open(f"{path}/schedstat") as fd:
+                run_delay = int(fd.read().split()[1]) / 1e9
+        else:
+            run_delay = 0.0
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    return {
+        "name": status.get("Name", ""),
+        "user_time": int(stat[11]) / CLOCK_TICKS,
+        "system_time": int(stat[12]) / CLOCK_TICKS,
+        "voluntary_switches": int(status.get("voluntary_ctxt_switches", 0)),
+        "involuntary_switches": int(status.get("nonvoluntary_ctxt_switches", 0)),
+        "run_delay": run_delay,
+    }
+
+
+def list_threads(pid):
+    try:
+        return sorted(int(tid) for tid in os.listdir(f"/proc/{pid}/task"))
+    except (FileNotFoundError, ProcessLookupError):
+        return []
+
+
+class ProcessMonitor:
+    def __init__(self, root, sched_interval=0.1):
+        self.root = root
+        self.sched_interval = sched_interval
+        self.last_sched = None
+        self.start = time.perf_counter()
+        self.processes = {}
+        self.totals = []
+        self.parent = None
+
+    def sample(self):
+        t = time.perf_counter() - self.start
+        total = {"t": t, "rss": 0, "pss": 0, "uss": 0}
+        # Reading every thread's counters is slower, so do it less often
+        sched = self.last_sched is None or t - self.last_sched >= self.sched_interval
+        if sched:
+            self.last_sched = t
+        for pid in get_process_tree(self.root):
+            sample = sample_process(pid)
+            if sample is None:
+                continue
+            if self.parent is None and sample["name"].startswith("python"):
+                self.parent = pid
+            process = self.processes.setdefault(
+                pid,
+                {
+                    "name": sample["name"],
+                    "peak": {"rss": 0, "pss": 0, "uss": 0},
+                    "series": [],
+                },
+            )
+            peak = process["peak"]
+            peak["rss"] = max(peak["rss"], sample["rss"], sample["hwm"])
+            peak["pss"] = max(peak["pss"], sample["pss"])
+            peak["uss"] = max(peak["uss"], sample["uss"])
+            process["threads"] = max(process.get("threads", 0), sample["threads"])
+            process["series"].append(
+                [t, sample["rss"], sample["pss"], sample["uss"]]
+            )
+            for key in ("rss", "pss", "uss"):
+                total[key] += sample[key]
+            if sched:
+                self.sample_threads(pid, process.setdefault("sched", {}))
+        self.totals.append(total)
+
+    def sample_threads(self, pid, threads):
+        # Threads that have exited keep the counters from their last sample
+        for tid in list_threads(pid):
+            counters = sample_thread(pid, tid)
+            if counters is not None:
+                threads[tid] = counters
+
+    def workers(self):
+        # Every process sampled after the parent is one of its descendants
+        if self.parent is None:
+            return []
+        pids = list(self.processes)
+        return pids[pids.index(self.parent) + 1 :]
+
+    def summary(self, rusage=None):
+        """
+        `rusage` is the root process's, from `os.wait4`, for exact totals of
+        the CPU times and context switches.
+        """
+        summary = {}
+        for key in ("rss", "pss", "uss"):
+            summary[f"{key}_peak"] = max((x[key] for x in self.totals), default=0)
+            summary[f"parent_{key}_peak"] = (
+                self.processes[self.parent]["peak"][key]
+                if self.parent is not None
+                else 0
+            )
+            summary[f"worker_{key}_peak"] = max(
+                (self.processes[pid]["peak"][key] for pid in self.workers()),
+                default=0,
+            )
+        summary["worker_processes"] = len(self.workers())
+        for key in SCHED_KEYS:
+            summary[key] = sum(
+                counters[key]
+                for process in self.processes.values()
+                for counters in process.get("sched", {}).values()
+            )
+        if rusage is not None:
+            summary["user_time"] = rusage.ru_utime
+            summary["system_time"] = rusage.ru_stime
+            summary["voluntary_switches"] = rusage.ru_nvcsw
+            summary["involuntary_switches"] = rusage.ru_nivcsw
+        return summary
+
+    def to_json(self):
+        return {
+            "parent": self.parent,
+            "summary": self.summary(),
+            "totals": self.totals,
+            "processes": self.processes,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a command and sample the memory usage and scheduler "
+        "statistics of its process tree"
+    )
+    parser.add_argument(
+        "-i",
+        "--interval",
+        type=float,
+        help="Seconds between samples",
+        default=0.01,
+    )
+    parser.add_argument(
+        "-s",
+        "--sched-interval",
+        type=float,
+        help="Seconds between samples of the per-thread scheduler statistics",
+        default=0.1,
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write the per-process time series to this JSON file"
+    )
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    proc = subprocess.Popen(args.command)
+    monitor = ProcessMonitor(proc.pid, args.sched_interval)
+    while True:
+        # Rather than proc.poll(), to get the rusage of the whole tree
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            break
+        monitor.sample()
+        time.sleep(args.interval)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    for key, val in monitor.summary(rusage).items():
+        if key.endswith("_peak"):
+            print(f"{key}: {val} kb", file=sys.stderr)
+        elif isinstance(val, float):
+            print(f"{key}: {val:.3f}", file=sys.stderr)
+        else:
+            print(f"{key}: {val}", file=sys.stderr)
+
+    if args.output is not None:
+        with open(args.output, "w") as fd:
+            json.dump(monitor.to_json(), fd)
+
+    return proc.returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
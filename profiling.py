@@ -0,0 +1,214 @@
+"""
+A sampling profiler that runs inside every worker, whether a thread, a
+subprocess or a subinterpreter, and sends its samples back with each result.
+
+Each worker has one sampler thread, which keeps running from one task to the
+next, so tasks shorter than the interval are sampled in proportion to their
+share of the run. While a task runs, its stack is sampled every
+`SAMPLE_INTERVAL` seconds:
+
+  - In threads and subprocesses, by reading the task's frame from
+    `sys._current_frames()`.
+  - In subinterpreters, `sys._current_frames()` also walks the frames of the
+    other interpreters, which run concurrently under their own GILs, so it
+    isn't safe to call. Instead, a `sys.monitoring` callback for line events
+    records the stack and disables itself for that line, and the sampler
+    thread re-enables them all with `sys.monitoring.restart_events()` every
+    interval. Only the first line executed after that is sampled, so between
+    samples there is no overhead.
+
+The stacks are merged in the parent and written in the collapsed-stack format
+(one `frame;frame;frame count` line per stack), which flamegraph.pl,
+speedscope and inferno all read, and which can be diffed across modes.
+"""
+
+import os
+import sys
+import threading
+import time
+
+SAMPLE_INTERVAL = 0.005
+
+# How long a worker's sampler thread keeps running without a task to sample
+IDLE_TIMEOUT = 0.1
+
+try:
+    import _interpreters as interpreters
+except ImportError:
+    try:
+        import _xxsubinterpreters as interpreters
+    except ImportError:
+        interpreters = None
+
+IN_SUBINTERPRETER = (
+    interpreters is not None and interpreters.get_current() != interpreters.get_main()
+)
+
+# The sys.monitoring tool id the subinterpreter sampler registers as
+TOOL_ID = 2  # sys.monitoring.PROFILER_ID
+
+
+def frame_name(code):
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def collapse(frame, stop):
+    """
+    Returns the stack ending at `frame` as a collapsed-stack line, starting
+    below the frame running the code `stop`, or "" if `frame` isn't running
+    below it.
+    """
+    names = []
+    while frame is not None and frame.f_code is not stop:
+        names.append(frame_name(frame.f_code))
+        frame = frame.f_back
+    if frame is None:
+        return ""
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """
+    Samples the stacks of the tasks run by one worker thread. It is started by
+    the worker's first task and keeps running across tasks, so that tasks
+    shorter than the interval are still sampled in proportion to the time they
+    take, and stops once the worker has been idle for `IDLE_TIMEOUT`, so that
+    it doesn't hold up the shutdown of a subinterpreter.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.target = threading.get_ident()
+        self.pid = os.getpid()
+        self.samples = {}
+        # Whether a task is running, only changed with the lock held
+        self.active = False
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pending = False
+
+    def record(self, frame):
+        stack = collapse(frame, ProfiledTask.__call__.__code__)
+        if stack:
+            self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def ensure_running(self):
+        """Starts the sampler thread if it isn't running. Needs the lock."""
+        if self.thread is not None:
+            return
+        if IN_SUBINTERPRETER:
+            monitoring = sys.monitoring
+            monitoring.use_tool_id(TOOL_ID, "pool-party")
+            monitoring.register_callback(TOOL_ID, monitoring.events.LINE, self.on_line)
+            monitoring.set_events(TOOL_ID, monitoring.events.LINE)
+        # Subinterpreters don't allow daemon threads, elsewhere a daemon
+        # doesn't keep the worker from exiting before it goes idle
+        self.thread = threading.Thread(target=self.run, daemon=not IN_SUBINTERPRETER)
+        self.thread.start()
+
+    def run(self):
+        idle = 0.0
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.active:
+                    idle += self.interval
+                    if idle >= IDLE_TIMEOUT:
+                        self.stop()
+                        return
+                    continue
+                idle = 0.0
+                if IN_SUBINTERPRETER:
+                    self.pending = True
+                    sys.monitoring.restart_events()
+                else:
+                    frame = sys._current_frames().get(self.target)
+                    if frame is not None:
+                        self.record(frame)
+
+    def stop(self):
+        """Called by the sampler thread with the lock held, as it exits."""
+        if IN_SUBINTERPRETER:
+            monitoring = sys.monitoring
+            monitoring.set_events(TOOL_ID, 0)
+            monitoring.register_callback(TOOL_ID, monitoring.events.LINE, None)
+            monitoring.free_tool_id(TOOL_ID)
+        self.thread = None
+
+    def on_line(self, code, line_number):
+        # Runs in whichever thread executes the line, so only the task
+        # thread's lines are recorded, and only while its task runs
+        if self.pending and self.active and threading.get_ident() == self.target:
+            self.pending = False
+            self.record(sys._getframe(1))
+        return sys.monitoring.DISABLE
+
+
+# The sampler of the worker running in each thread, by thread id. Not a
+# threading.local, since each `run_string` in a subinterpreter runs on a new
+# thread state, which starts without the thread's locals.
+samplers = {}
+
+
+class ProfiledTask:
+    """Wraps a task function to sample its stacks while it runs."""
+
+    def __init__(self, func, interval=SAMPLE_INTERVAL):
+        self.func = func
+        self.interval = interval
+
+    def __call__(self, arg):
+        sampler = samplers.get(threading.get_ident())
+        # A forked worker inherits the sampler, but not its thread
+        if sampler is None or sampler.pid != os.getpid():
+            sampler = samplers[threading.get_ident()] = Sampler(self.interval)
+
+        # While the sampler holds the lock, this thread is either in the task,
+        # or blocked here, where the stack ends at this frame and is skipped
+        with sampler.lock:
+            sampler.ensure_running()
+            sampler.active = True
+        try:
+            result = self.func(arg)
+        finally:
+            with sampler.lock:
+                sampler.active = False
+                samples, sampler.samples = sampler.samples, {}
+
+        return result, samples
+
+
+class Profiler:
+    def __init__(self):
+        self.timed = False
+        self.stacks = {}
+
+    def wrap(self, func):
+        return ProfiledTask(func)
+
+    def start_round(self, timed=True):
+        """Untimed (warmup) rounds are run, but their samples dropped."""
+        self.timed = timed
+
+    def record(self, result):
+        value, samples = result
+        if self.timed:
+            for stack, count in samples.items():
+                self.stacks[stack] = self.stacks.get(stack, 0) + count
+        return value
+
+    def receive(self, results):
+        return [self.record(x) for x in results]
+
+    def stream(self, results):
+        for x in results:
+            yield self.record(x)
+
+    def nsamples(self):
+        return sum(self.stacks.values())
+
+    def write(self, filename):
+        with open(filename, "w") as fd:
+            for stack, count in sorted(self.stacks.items()):
+                fd.write(f"{stack} {count}\n")
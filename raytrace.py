@@ -5,6 +5,10 @@ DEFAULT_WIDTH = 100
 DEFAULT_HEIGHT = 100
 EPSILON = 0.00001
 
+# The number of tasks, and the size of each: the width and height of the image
+COUNT = 64
+SIZE = 100
+
 
 class Vector(object):
 
@@ -229,7 +233,7 @@ class Scene(object):
     def addLight(self, p):
         self.lightPoints.append(p)
 
-    def render(self, canvas):
+    def render(self, canvas, rows=None):
         fovRadians = math.pi * (self.fieldOfView / 2.0) / 180.0
         halfWidth = math.tan(fovRadians)
         halfHeight = 0.75 * halfWidth
@@ -242,7 +246,11 @@ class Scene(object):
         vpRight = eye.vector.cross(Vector.UP).normalized()
         vpUp = vpRight.cross(eye.vector).normalized()
 
-        for y in range(canvas.height):
+        # Render only the given scanlines, e.g. one band of a larger frame
+        if rows is None:
+            rows = range(canvas.height)
+
+        for y in rows:
             for x in range(canvas.width):
                 xcomp = vpRight.scale(x * pixelWidth - halfWidth)
                 ycomp = vpUp.scale(y * pixelHeight - halfHeight)
@@ -341,31 +349,39 @@ class CheckerboardSurface(SimpleSurface):
             return self.baseColour
 
 
+def make_scene():
+    s = Scene()
+    s.addLight(Point(30, 30, 10))
+    s.addLight(Point(-10, 100, 30))
+    s.lookAt(Point(0, 3, 0))
+    s.addObject(Sphere(Point(1, 3, -10), 2),
+                SimpleSurface(baseColour=(1, 1, 0)))
+    for y in range(6):
+        s.addObject(Sphere(Point(-3 - y * 0.4, 2.3, -5), 0.4),
+                    SimpleSurface(baseColour=(y / 6.0, 1 - y / 6.0, 0.5)))
+    s.addObject(Halfspace(Point(0, 0, 0), Vector.UP),
+                CheckerboardSurface())
+    return s
+
+
 def bench(args):
     loops, width, height = args
     range_it = range(loops)
 
     for i in range_it:
         canvas = Canvas(width, height)
-        s = Scene()
-        s.addLight(Point(30, 30, 10))
-        s.addLight(Point(-10, 100, 30))
-        s.lookAt(Point(0, 3, 0))
-        s.addObject(Sphere(Point(1, 3, -10), 2),
-                    SimpleSurface(baseColour=(1, 1, 0)))
-        for y in range(6):
-            s.addObject(Sphere(Point(-3 - y * 0.4, 2.3, -5), 0.4),
-                        SimpleSurface(baseColour=(y / 6.0, 1 - y / 6.0, 0.5)))
-        s.addObject(Halfspace(Point(0, 0, 0), Vector.UP),
-                    CheckerboardSurface())
-        s.render(canvas)
+        make_scene().render(canvas)
 
     return [0]
 
 
-def get_data():
-    return [(1, 100, 100)] * 64
+def get_data(count=COUNT, size=SIZE):
+    return [(1, size, size)] * count
 
 
-def assert_result(result):
-    assert result == [[0]] * 64
+def assert_result(result, count=COUNT, size=SIZE):
+    n = 0
+    for x in result:
+        assert x == [0]
+        n += 1
+    assert n == count
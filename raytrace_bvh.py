@@ -0,0 +1,166 @@
+"""
+Renders the same scenes as `raytrace_spheres`, but with the spheres in a
+bounding volume hierarchy, which is built once for each scene and used for
+both the primary (and reflected) rays and the shadow rays. Comparing the two
+shows an algorithmic speedup side by side with the parallel speedup of the
+pool.
+
+The hierarchy only changes which objects are tested against each ray, not
+how, and ties are broken in the same order as the linear scan, so the
+pixels are identical to those of `raytrace_spheres`. Unbounded objects (the
+checkerboard) are still tested linearly.
+"""
+
+import math
+
+from raytrace import EPSILON, Ray, Scene, Sphere
+from raytrace_spheres import COUNT, SIZE, get_data, assert_result, render
+
+# The most objects in a leaf of the hierarchy
+LEAF_SIZE = 4
+
+
+class BVHNode:
+    """
+    An axis-aligned bounding box around either two child nodes, or (for a
+    leaf) a list of `(index, object, surface)`.
+    """
+
+    __slots__ = ("lo", "hi", "children", "items")
+
+    def __init__(self, items):
+        boxes = [sphere_bounds(o) for (i, o, s) in items]
+        # Padded, so that rounding errors never cull a box whose sphere is hit
+        self.lo = tuple(min(b[0][k] for b in boxes) - EPSILON for k in range(3))
+        self.hi = tuple(max(b[1][k] for b in boxes) + EPSILON for k in range(3))
+        if len(items) <= LEAF_SIZE:
+            self.children = ()
+            self.items = items
+        else:
+            # Split at the median of the centres along the longest axis
+            axis = max(range(3), key=lambda k: self.hi[k] - self.lo[k])
+            items = sorted(items, key=lambda x: point_coords(x[1].centre)[axis])
+            middle = len(items) // 2
+            self.children = (BVHNode(items[:middle]), BVHNode(items[middle:]))
+            self.items = ()
+
+    def entry_time(self, origin, inverse, tmax):
+        """
+        Returns the time at which a ray enters the box, or None if it misses
+        it, or only hits it before EPSILON or after `tmax`.
+        """
+        tmin = -EPSILON
+        for k in range(3):
+            t1 = (self.lo[k] - origin[k]) * inverse[k]
+            t2 = (self.hi[k] - origin[k]) * inverse[k]
+            if t1 > t2:
+                t1, t2 = t2, t1
+            if t1 > tmin:
+                tmin = t1
+            if t2 < tmax:
+                tmax = t2
+            if tmin > tmax:
+                return None
+        return tmin
+
+
+def point_coords(p):
+    return (p.x, p.y, p.z)
+
+
+def sphere_bounds(sphere):
+    c = point_coords(sphere.centre)
+    r = sphere.radius
+    return tuple(x - r for x in c), tuple(x + r for x in c)
+
+
+def ray_coords(ray):
+    # Directions parallel to an axis get a huge (rather than infinite)
+    # inverse, so that the slab test never multiplies zero by infinity
+    inverse = tuple(1.0 / d if d else 1e300 for d in point_coords(ray.vector))
+    return point_coords(ray.point), inverse
+
+
+class BVHScene(Scene):
+    def render(self, canvas, rows=None):
+        items = [
+            (index, o, s)
+            for (index, (o, s)) in enumerate(self.objects)
+            if isinstance(o, Sphere)
+        ]
+        self.bvh = BVHNode(items) if items else None
+        self.unbounded = [
+            (index, o, s)
+            for (index, (o, s)) in enumerate(self.objects)
+            if not isinstance(o, Sphere)
+        ]
+        Scene.render(self, canvas, rows)
+
+    def firstIntersection(self, ray):
+        """
+        The nearest of the intersections in front of the ray, breaking ties
+        by the order in which the objects were added, like
+        `raytrace.firstIntersection`.
+        """
+        best = None
+        bestT = math.inf
+        bestIndex = math.inf
+
+        def consider(items):
+            nonlocal best, bestT, bestIndex
+            for (index, o, s) in items:
+                t = o.intersectionTime(ray)
+                if t is not None and t > -EPSILON:
+                    if t < bestT or (t == bestT and index < bestIndex):
+                        best, bestT, bestIndex = (o, t, s), t, index
+
+        if self.bvh is not None:
+            origin, inverse = ray_coords(ray)
+            stack = [self.bvh]
+            while stack:
+                node = stack.pop()
+                if node.entry_time(origin, inverse, bestT + EPSILON) is None:
+                    continue
+                consider(node.items)
+                stack.extend(node.children)
+        consider(self.unbounded)
+        return best
+
+    def rayColour(self, ray):
+        if self.recursionDepth > 3:
+            return (0, 0, 0)
+        try:
+            self.recursionDepth = self.recursionDepth + 1
+            i = self.firstIntersection(ray)
+            if i is None:
+                return (0, 0, 0)  # the background colour
+            else:
+                (o, t, s) = i
+                p = ray.pointAtTime(t)
+                return s.colourAt(self, ray, p, o.normalAt(p))
+        finally:
+            self.recursionDepth = self.recursionDepth - 1
+
+    def _lightIsVisible(self, l, p):
+        ray = Ray(p, l - p)
+        for (index, o, s) in self.unbounded:
+            t = o.intersectionTime(ray)
+            if t is not None and t > EPSILON:
+                return False
+        if self.bvh is not None:
+            origin, inverse = ray_coords(ray)
+            stack = [self.bvh]
+            while stack:
+                node = stack.pop()
+                if node.entry_time(origin, inverse, math.inf) is None:
+                    continue
+                for (index, o, s) in node.items:
+                    t = o.intersectionTime(ray)
+                    if t is not None and t > EPSILON:
+                        return False
+                stack.extend(node.children)
+        return True
+
+
+def bench(args):
+    return render(args, BVHScene)
@@ -0,0 +1,294 @@
+"""
+A compact variant of the raytrace benchmark, to measure how much of its cost
+(and of its threaded slowdown) comes from allocating objects and mutating
+shared instance state.
+
+Vectors and points are plain tuples of floats, rather than dict-backed
+`Vector`/`Point`/`Ray` instances, and there are no `mustBeVector` checks. The
+scene objects use `__slots__`, and the recursion depth is passed down as an
+argument rather than stored on the `Scene` and updated for every ray.
+
+Every arithmetic operation is done in the same order as in raytrace.py, so
+the output is pixel-identical to it.
+"""
+
+import functools
+import hashlib
+import math
+
+import raytrace
+from raytrace import Canvas, COUNT, EPSILON, SIZE
+
+# The SHA-256 of the pixels that raytrace.py renders on a 100x100 canvas
+REFERENCE_DIGEST = "11f2c36b02044f115c3937cae1156e9528b95da70f9d6b737a262f06757c2e6b"
+
+UP = (0, 1, 0)
+ORIGIN = (0, 0, 0)
+
+
+def add(a, b):
+    return (a[0] + b[0], a[1] + b[1], a[2] + b[2])
+
+
+def sub(a, b):
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+
+
+def scale(a, factor):
+    return (factor * a[0], factor * a[1], factor * a[2])
+
+
+def dot(a, b):
+    return (a[0] * b[0]) + (a[1] * b[1]) + (a[2] * b[2])
+
+
+def cross(a, b):
+    return (
+        a[1] * b[2] - a[2] * b[1],
+        a[2] * b[0] - a[0] * b[2],
+        a[0] * b[1] - a[1] * b[0],
+    )
+
+
+def normalized(a):
+    return scale(a, 1.0 / math.sqrt(dot(a, a)))
+
+
+def reflect_through(a, normal):
+    d = scale(normal, dot(a, normal))
+    return sub(a, scale(d, 2))
+
+
+class Sphere:
+    __slots__ = ("centre", "radius")
+
+    def __init__(self, centre, radius):
+        self.centre = centre
+        self.radius = radius
+
+    def intersectionTime(self, point, vector):
+        cp = sub(self.centre, point)
+        v = dot(cp, vector)
+        discriminant = (self.radius * self.radius) - (dot(cp, cp) - v * v)
+        if discriminant < 0:
+            return None
+        else:
+            return v - math.sqrt(discriminant)
+
+    def normalAt(self, p):
+        return normalized(sub(p, self.centre))
+
+
+class Halfspace:
+    __slots__ = ("point", "normal")
+
+    def __init__(self, point, normal):
+        self.point = point
+        self.normal = normalized(normal)
+
+    def intersectionTime(self, point, vector):
+        v = dot(vector, self.normal)
+        if v:
+            return 1 / -v
+        else:
+            return None
+
+    def normalAt(self, p):
+        return self.normal
+
+
+def firstIntersection(intersections):
+    result = None
+    for i in intersections:
+        candidateT = i[1]
+        if candidateT is not None and candidateT > -EPSILON:
+            if result is None or candidateT < result[1]:
+                result = i
+    return result
+
+
+class Scene:
+    __slots__ = ("objects", "lightPoints", "position", "lookingAt", "fieldOfView")
+
+    def __init__(self):
+        self.objects = []
+        self.lightPoints = []
+        self.position = (0, 1.8, 10)
+        self.lookingAt = ORIGIN
+        self.fieldOfView = 45
+
+    def lookAt(self, p):
+        self.lookingAt = p
+
+    def addObject(self, object, surface):
+        self.objects.append((object, surface))
+
+    def addLight(self, p):
+        self.lightPoints.append(p)
+
+    def render(self, canvas):
+        fovRadians = math.pi * (self.fieldOfView / 2.0) / 180.0
+        halfWidth = math.tan(fovRadians)
+        halfHeight = 0.75 * halfWidth
+        width = halfWidth * 2
+        height = halfHeight * 2
+        pixelWidth = width / (canvas.width - 1)
+        pixelHeight = height / (canvas.height - 1)
+
+        eyePoint = self.position
+        eyeVector = normalized(sub(self.lookingAt, self.position))
+        vpRight = normalized(cross(eyeVector, UP))
+        vpUp = normalized(cross(vpRight, eyeVector))
+
+        for y in range(canvas.height):
+            for x in range(canvas.width):
+                xcomp = scale(vpRight, x * pixelWidth - halfWidth)
+                ycomp = scale(vpUp, y * pixelHeight - halfHeight)
+                vector = normalized(add(add(eyeVector, xcomp), ycomp))
+                colour = self.rayColour(eyePoint, vector, 0)
+                canvas.plot(x, y, *colour)
+
+    def rayColour(self, point, vector, depth):
+        if depth > 3:
+            return (0, 0, 0)
+        intersections = [
+            (o, o.intersectionTime(point, vector), s) for (o, s) in self.objects
+        ]
+        i = firstIntersection(intersections)
+        if i is None:
+            return (0, 0, 0)  # the background colour
+        else:
+            (o, t, s) = i
+            p = add(point, scale(vector, t))
+            return s.colourAt(self, vector, p, o.normalAt(p), depth + 1)
+
+    def _lightIsVisible(self, l, p):
+        vector = normalized(sub(l, p))
+        for (o, s) in self.objects:
+            t = o.intersectionTime(p, vector)
+            if t is not None and t > EPSILON:
+                return False
+        return True
+
+    def visibleLights(self, p):
+        result = []
+        for l in self.lightPoints:
+            if self._lightIsVisible(l, p):
+                result.append(l)
+        return result
+
+
+def addColours(a, scale, b):
+    return (a[0] + scale * b[0], a[1] + scale * b[1], a[2] + scale * b[2])
+
+
+class SimpleSurface:
+    __slots__ = (
+        "baseColour",
+        "specularCoefficient",
+        "lambertCoefficient",
+        "ambientCoefficient",
+    )
+
+    def __init__(self, **kwargs):
+        self.baseColour = kwargs.get("baseColour", (1, 1, 1))
+        self.specularCoefficient = kwargs.get("specularCoefficient", 0.2)
+        self.lambertCoefficient = kwargs.get("lambertCoefficient", 0.6)
+        self.ambientCoefficient = (
+            1.0 - self.specularCoefficient - self.lambertCoefficient
+        )
+
+    def baseColourAt(self, p):
+        return self.baseColour
+
+    def colourAt(self, scene, vector, p, normal, depth):
+        b = self.baseColourAt(p)
+
+        c = (0, 0, 0)
+        if self.specularCoefficient > 0:
+            reflected = normalized(reflect_through(vector, normal))
+            reflectedColour = scene.rayColour(p, reflected, depth)
+            c = addColours(c, self.specularCoefficient, reflectedColour)
+
+        if self.lambertCoefficient > 0:
+            lambertAmount = 0
+            for lightPoint in scene.visibleLights(p):
+                contribution = dot(normalized(sub(lightPoint, p)), normal)
+                if contribution > 0:
+                    lambertAmount = lambertAmount + contribution
+            lambertAmount = min(1, lambertAmount)
+            c = addColours(c, self.lambertCoefficient * lambertAmount, b)
+
+        if self.ambientCoefficient > 0:
+            c = addColours(c, self.ambientCoefficient, b)
+
+        return c
+
+
+class CheckerboardSurface(SimpleSurface):
+    __slots__ = ("otherColour", "checkSize")
+
+    def __init__(self, **kwargs):
+        SimpleSurface.__init__(self, **kwargs)
+        self.otherColour = kwargs.get("otherColour", (0, 0, 0))
+        self.checkSize = kwargs.get("checkSize", 1)
+
+    def baseColourAt(self, p):
+        # raytrace.py scales this vector by 1 / checkSize, but discards the
+        # result, so the check size has no effect there either.
+        v = sub(p, ORIGIN)
+        if (int(abs(v[0]) + 0.5) + int(abs(v[1]) + 0.5) + int(abs(v[2]) + 0.5)) % 2:
+            return self.otherColour
+        else:
+            return self.baseColour
+
+
+def make_scene():
+    s = Scene()
+    s.addLight((30, 30, 10))
+    s.addLight((-10, 100, 30))
+    s.lookAt((0, 3, 0))
+    s.addObject(Sphere((1, 3, -10), 2), SimpleSurface(baseColour=(1, 1, 0)))
+    for y in range(6):
+        s.addObject(
+            Sphere((-3 - y * 0.4, 2.3, -5), 0.4),
+            SimpleSurface(baseColour=(y / 6.0, 1 - y / 6.0, 0.5)),
+        )
+    s.addObject(Halfspace((0, 0, 0), UP), CheckerboardSurface())
+    return s
+
+
+def bench(args):
+    loops, width, height = args
+    range_it = range(loops)
+
+    digests = []
+    for i in range_it:
+        canvas = Canvas(width, height)
+        make_scene().render(canvas)
+        digests.append(hashlib.sha256(canvas.bytes).hexdigest())
+
+    return digests
+
+
+@functools.cache
+def reference_digest(size):
+    """The SHA-256 of the pixels that raytrace.py renders on a canvas of `size`."""
+    if size == SIZE:
+        return REFERENCE_DIGEST
+    canvas = Canvas(size, size)
+    raytrace.make_scene().render(canvas)
+    return hashlib.sha256(canvas.bytes).hexdigest()
+
+
+def get_data(count=COUNT, size=SIZE):
+    return [(1, size, size)] * count
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    expected = [reference_digest(size)]
+    n = 0
+    for x in result:
+        assert x == expected
+        n += 1
+    assert n == count
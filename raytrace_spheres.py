@@ -0,0 +1,90 @@
+"""
+The `raytrace` benchmark with a scene of many small spheres scattered over the
+checkerboard, to see how the cost of testing every ray against every object
+grows with the size of the scene. The number of spheres is a parameter of
+`get_data()`; `raytrace_bvh` renders the same scenes with a bounding volume
+hierarchy.
+"""
+
+import functools
+import hashlib
+import random
+
+from raytrace import (
+    Canvas,
+    CheckerboardSurface,
+    Halfspace,
+    Point,
+    Scene,
+    SimpleSurface,
+    Sphere,
+    Vector,
+)
+
+NSPHERES = 256
+WIDTH = 32
+HEIGHT = 24
+
+# The number of tasks, and the size of each: the number of spheres in its scene
+COUNT = 64
+SIZE = NSPHERES
+
+# The SHA-256 of the pixels rendered for the default scene and canvas size
+REFERENCE_DIGEST = "554cce45965d1b379c932c1fe7fdfae394d3e3fece262198909d5f9ebd4d7222"
+
+
+def make_scene(nspheres, scene_type=Scene):
+    # Seeded, so that every task and every scene type renders the same scene
+    rng = random.Random(nspheres)
+    s = scene_type()
+    s.addLight(Point(30, 30, 10))
+    s.addLight(Point(-10, 100, 30))
+    s.lookAt(Point(0, 3, 0))
+    for i in range(nspheres):
+        s.addObject(
+            Sphere(
+                Point(rng.uniform(-8, 8), rng.uniform(0.5, 6), rng.uniform(-30, -2)),
+                rng.uniform(0.2, 0.5),
+            ),
+            SimpleSurface(baseColour=(rng.random(), rng.random(), rng.random())),
+        )
+    s.addObject(Halfspace(Point(0, 0, 0), Vector.UP), CheckerboardSurface())
+    return s
+
+
+def render(args, scene_type=Scene):
+    loops, width, height, nspheres = args
+    range_it = range(loops)
+
+    digests = []
+    for i in range_it:
+        canvas = Canvas(width, height)
+        make_scene(nspheres, scene_type).render(canvas)
+        digests.append(hashlib.sha256(canvas.bytes).hexdigest())
+
+    return digests
+
+
+def bench(args):
+    return render(args)
+
+
+@functools.cache
+def reference_digest(nspheres):
+    """The SHA-256 of the pixels of the scene of `nspheres`, rendered linearly."""
+    if nspheres == NSPHERES:
+        return REFERENCE_DIGEST
+    return render((1, WIDTH, HEIGHT, nspheres))[0]
+
+
+def get_data(count=COUNT, size=SIZE):
+    return [(1, WIDTH, HEIGHT, size)] * count
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    expected = [reference_digest(size)]
+    n = 0
+    for x in result:
+        assert x == expected
+        n += 1
+    assert n == count
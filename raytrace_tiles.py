@@ -0,0 +1,142 @@
+"""
+Renders a single large frame of the `raytrace` scene, split into bands of
+scanlines that are distributed across the pool's workers, so that one frame
+can use more than one core.
+
+The frame is a file in shared memory (`/dev/shm`, where available) created by
+`get_data()` in the parent. Each task maps it with `mmap` and plots its band
+of pixels straight into it through a `Canvas` whose `bytes` is the shared
+buffer, so only the band coordinates go back through the pool. Mapping a
+file (rather than attaching to a `multiprocessing.shared_memory` segment)
+keeps the workers away from the resource tracker, which would otherwise
+unlink or complain about the frame when threads and forked workers attach to
+it concurrently. Every
+round renders exactly one frame, so the compute time reported by pool.py is
+the latency of rendering a frame.
+
+`assert_result` checks that every scanline was rendered exactly once, then
+writes the frame out with `Canvas.write_ppm` and compares the file against
+the one raytrace.py renders sequentially.
+"""
+
+import atexit
+import functools
+import hashlib
+import mmap
+import os
+import tempfile
+
+from raytrace import Canvas, make_scene
+
+WIDTH = 400
+HEIGHT = 300
+BAND_ROWS = 5
+
+# The number of tasks, i.e. of bands, and the size of each: the width of the
+# frame, which is 4:3
+COUNT = HEIGHT // BAND_ROWS
+SIZE = WIDTH
+
+# The SHA-256 of the PPM file that raytrace.py writes for a WIDTH x HEIGHT
+# canvas
+REFERENCE_DIGEST = "d6b19c96ca04dfc96a81f9ede73f9cd2093bdc29b3ac8c292c53a7a959bfc84b"
+
+SHARED_MEMORY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# The frames created by get_data() in the parent, mapped, by filename
+FRAMES = {}
+
+
+class SharedCanvas(Canvas):
+    """A `Canvas` that plots into an existing buffer."""
+
+    def __init__(self, buf, width, height):
+        self.bytes = buf
+        self.width = width
+        self.height = height
+
+
+def clear_frame(buf):
+    # The same blue background that `Canvas` starts with
+    buf[:] = bytes((0, 0, 255)) * (len(buf) // 3)
+
+
+def map_frame(filename):
+    with open(filename, "r+b") as fd:
+        return mmap.mmap(fd.fileno(), 0)
+
+
+def close_frames():
+    for filename, frame in FRAMES.items():
+        frame.close()
+        os.unlink(filename)
+    FRAMES.clear()
+
+
+atexit.register(close_frames)
+
+
+def bench(args):
+    filename, width, height, start, stop = args
+    with map_frame(filename) as frame:
+        canvas = SharedCanvas(frame, width, height)
+        make_scene().render(canvas, range(start, stop))
+    return filename, start, stop
+
+
+def frame_height(width):
+    return width * HEIGHT // WIDTH
+
+
+def ppm_digest(canvas):
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "frame.ppm")
+        canvas.write_ppm(filename)
+        with open(filename, "rb") as fd:
+            return hashlib.sha256(fd.read()).hexdigest()
+
+
+@functools.cache
+def reference_digest(width):
+    """The SHA-256 of the PPM file that raytrace.py writes for a frame."""
+    if width == WIDTH:
+        return REFERENCE_DIGEST
+    canvas = Canvas(width, frame_height(width))
+    make_scene().render(canvas)
+    return ppm_digest(canvas)
+
+
+def get_data(count=COUNT, size=SIZE):
+    width, height = size, frame_height(size)
+    # Round up, so that there are at most `count` bands
+    band_rows = max(1, -(-height // count))
+    fd, filename = tempfile.mkstemp(
+        prefix="raytrace_tiles-", suffix=".frame", dir=SHARED_MEMORY_DIR
+    )
+    os.ftruncate(fd, width * height * 3)
+    os.close(fd)
+    frame = map_frame(filename)
+    clear_frame(frame)
+    FRAMES[filename] = frame
+    return [
+        (filename, width, height, y, min(y + band_rows, height))
+        for y in range(0, height, band_rows)
+    ]
+
+
+def assert_result(result, count=COUNT, size=SIZE):
+    width, height = size, frame_height(size)
+    filenames = set()
+    rows = []
+    for filename, start, stop in result:
+        filenames.add(filename)
+        rows.extend(range(start, stop))
+    assert len(filenames) == 1
+    assert sorted(rows) == list(range(height))
+
+    frame = FRAMES[filenames.pop()]
+    with memoryview(frame) as view:
+        assert ppm_digest(SharedCanvas(view, width, height)) == reference_digest(width)
+
+    # The same tasks may render this frame again in the next round
+    clear_frame(frame)
@@ -0,0 +1,83 @@
+"""
+Measuring how long it takes for a pool's workers to come up, and the tasks
+that `pool.py --startup` runs in them.
+
+The tasks only use `os`, `time` and `importlib`, so that they work the same
+way in threads, subprocesses and subinterpreters.
+"""
+
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+
+
+# How long to wait for all of the workers to arrive before giving up
+READY_TIMEOUT = 60.0
+
+
+def ready(args):
+    """
+    A task that blocks until `nworkers` tasks are running at the same time,
+    which can only happen once every worker in the pool is up and running
+    one of them. Each worker leaves a marker file in `directory`, which works
+    as a barrier across threads, processes and interpreters alike.
+
+    Returns the time this worker arrived.
+    """
+    directory, nworkers = args
+    arrived = time.perf_counter()
+    marker = os.path.join(directory, f"{os.getpid()}-{threading.get_native_id()}")
+    open(marker, "w").close()
+    wait_for_workers(directory, nworkers, arrived)
+    return arrived
+
+
+def wait_for_workers(directory, nworkers, arrived):
+    """Blocks until `directory` holds a marker file from each of the workers."""
+    deadline = arrived + READY_TIMEOUT
+    while len(os.listdir(directory)) < nworkers:
+        if time.perf_counter() > deadline:
+            raise TimeoutError(
+                f"Only {len(os.listdir(directory))} of {nworkers} workers started"
+            )
+        time.sleep(0.001)
+
+
+def measure_worker_startup(pool, nworkers, created):
+    """
+    Returns the time from `created` (when pool creation started) until the
+    last worker of `pool` was ready to run tasks.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        arrivals = pool.map(ready, [(directory, nworkers)] * nworkers, 1)
+    return max(arrivals) - created
+
+
+def noop(arg):
+    return arg
+
+
+def import_cost(args):
+    """
+    A task that times executing the module at `path` afresh in the worker
+    running it, e.g. a benchmark's module-level constants and asserts. The
+    module isn't added to `sys.modules`, so this measures what the first
+    import costs even in workers that already have it, such as forked ones.
+    Like `ready`, it blocks until `nworkers` of them are running at once, so
+    that every worker runs exactly one.
+
+    Returns the time taken.
+    """
+    directory, nworkers, path = args
+    arrived = time.perf_counter()
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(f"_startup_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    elapsed = time.perf_counter() - arrived
+    marker = os.path.join(directory, f"{os.getpid()}-{threading.get_native_id()}")
+    open(marker, "w").close()
+    wait_for_workers(directory, nworkers, arrived)
+    return elapsed
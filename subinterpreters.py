@@ -0,0 +1,194 @@
+"""
+A subinterpreter executor built on the interpreters and channels API of
+unmodified CPython: the private `_xxsubinterpreters` and `_xxinterpchannels`
+modules in 3.12, renamed to `_interpreters` and `_interpchannels` in 3.13.
+This reproduces the subinterpreter results without the patched CPython
+branch that the `interp` and `interp2` modes need.
+
+Each worker is a thread that owns one subinterpreter (with its own GIL), and
+runs tasks in it with `run_string`. The function and its arguments are passed
+in through `run_string`'s shared namespace: objects the API can share (e.g.
+bytes, str, int, and since 3.13 float) as they are, tuples item by item, and only
+anything else is pickled. Results come back the same way over a channel, each
+item preceded by a tag saying how to rebuild it.
+
+The worker side, `run_task`, is imported in each subinterpreter.
+"""
+
+import concurrent.futures
+import os
+import pickle
+import queue
+import sys
+import threading
+import traceback
+
+try:
+    import _interpreters as interpreters
+    import _interpchannels as channels
+except ImportError:
+    try:
+        import _xxsubinterpreters as interpreters
+        import _xxinterpchannels as channels
+    except ImportError:
+        interpreters = channels = None
+
+# Since 3.13, each item on a channel has an "unbound" op, for when the
+# interpreter that sent it is destroyed before it is received.
+HAS_UNBOUND_OPS = channels is not None and channels.__name__ == "_interpchannels"
+UNBOUND_REMOVE = 1
+
+
+def shm_breaks_interp_stock(transport):
+    """
+    multiprocessing.shared_memory corrupts the heap inside 3.12's
+    subinterpreters, which aborts the process at exit.
+    """
+    return transport == "shm" and sys.version_info < (3, 13)
+
+SETUP = """\
+import os
+import sys
+sys.path[:] = path.split(os.pathsep)
+import pickle
+import subinterpreters
+"""
+
+
+def create_channel():
+    if HAS_UNBOUND_OPS:
+        return channels.create(UNBOUND_REMOVE)
+    return channels.create()
+
+
+def send(cid, obj):
+    if HAS_UNBOUND_OPS:
+        # Otherwise, this blocks until the item is received, which is only
+        # after the task is done
+        channels.send(cid, obj, blocking=False)
+    else:
+        channels.send(cid, obj)
+
+
+def recv(cid):
+    if HAS_UNBOUND_OPS:
+        obj, unboundop = channels.recv(cid)
+        return obj
+    return channels.recv(cid)
+
+
+def run_string(interp, script, shared):
+    # Since 3.13, an uncaught exception is returned rather than raised
+    error = interpreters.run_string(interp, script, shared)
+    if error is not None:
+        raise RuntimeError(error.errdisplay)
+
+
+def share(obj, name, shared):
+    """
+    Adds `obj` to the `shared` namespace, under names starting with `name`,
+    and returns an expression that rebuilds it inside the interpreter.
+    """
+    if type(obj) is tuple:
+        items = [share(x, f"{name}_{i}", shared) for i, x in enumerate(obj)]
+        return "(" + "".join(f"{item}, " for item in items) + ")"
+    if interpreters.is_shareable(obj):
+        shared[name] = obj
+        return name
+    shared[name] = pickle.dumps(obj, 5)
+    return f"pickle.loads({name})"
+
+
+def encode(obj, messages):
+    """Appends the tagged channel messages for `obj` to `messages`."""
+    if type(obj) is tuple:
+        messages.extend(("tuple", len(obj)))
+        for x in obj:
+            encode(x, messages)
+    elif interpreters.is_shareable(obj):
+        messages.extend(("raw", obj))
+    else:
+        messages.extend(("pickle", pickle.dumps(obj, 5)))
+
+
+def decode(cid):
+    tag = recv(cid)
+    if tag == "tuple":
+        return tuple(decode(cid) for _ in range(recv(cid)))
+    elif tag == "raw":
+        return recv(cid)
+    elif tag == "pickle":
+        return pickle.loads(recv(cid))
+    elif tag == "error":
+        raise pickle.loads(recv(cid))
+    raise ValueError(f"Unknown tag {tag!r}")
+
+
+def run_task(cid, task):
+    """Runs inside the subinterpreter, and sends the result to `cid`."""
+    fn, args, kwargs = task
+    messages = []
+    try:
+        encode(fn(*args, **kwargs), messages)
+    except BaseException as exc:
+        try:
+            error = pickle.dumps(exc)
+        except Exception:
+            error = pickle.dumps(RuntimeError(traceback.format_exc()))
+        messages = ["error", error]
+    for message in messages:
+        send(cid, message)
+
+
+class InterpreterExecutor(concurrent.futures.Executor):
+    def __init__(self, max_workers):
+        if interpreters is None:
+            raise RuntimeError("The subinterpreters API requires Python 3.12+")
+        self._max_workers = max_workers
+        self.tasks = queue.SimpleQueue()
+        self.workers = [threading.Thread(target=self.work) for _ in range(max_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        self.tasks.put((future, fn, args, kwargs))
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        for _ in self.workers:
+            self.tasks.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.join()
+
+    def work(self):
+        interp = interpreters.create()
+        cid = create_channel()
+        try:
+            try:
+                run_string(
+                    interp, SETUP, {"path": os.pathsep.join(sys.path), "cid": cid}
+                )
+                broken = None
+            except BaseException as exc:
+                # Fail the tasks rather than leaving them hanging
+                broken = exc
+
+            while (task := self.tasks.get()) is not None:
+                future, fn, args, kwargs = task
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if broken is not None:
+                    future.set_exception(broken)
+                    continue
+                shared = {}
+                expr = share((fn, args, kwargs), "task", shared)
+                try:
+                    run_string(interp, f"subinterpreters.run_task(cid, {expr})", shared)
+                    future.set_result(decode(cid))
+                except BaseException as exc:
+                    future.set_exception(exc)
+        finally:
+            channels.destroy(cid)
+            interpreters.destroy(interp)
@@ -0,0 +1,235 @@
+"""
+Per-task latency tracing.
+
+Each task is timestamped at five points:
+
+  - enqueue: when the round handed its tasks to the pool.
+  - dispatch: when the pool pulled the task from its input to send it to a
+    worker. In streaming mode, tasks are pulled from `get_data()` just before
+    waiting for room in flight, so this is the same as enqueue, and the
+    queueing time includes that wait.
+  - start, finish: when a worker started and finished running it, along with
+    the pid and native thread id of that worker.
+  - receipt: when its result was available to the caller. For `map`, this is
+    when the whole map returned.
+
+All timestamps come from `time.perf_counter`, which on Linux is the
+system-wide monotonic clock, so they can be compared across processes.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class TracedTask:
+    """Wraps a task function to record when and where each task ran."""
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, item):
+        index, arg = item
+        start = time.perf_counter()
+        result = self.func(arg)
+        finish = time.perf_counter()
+        return result, (index, os.getpid(), threading.get_native_id(), start, finish)
+
+
+class TracedInputs:
+    """
+    Tags each input with its index, recording when it is pulled by the pool.
+    Has a length, so that `Pool.map` iterates it lazily in its task handler
+    rather than converting it to a list up front.
+    """
+
+    def __init__(self, tracer, data):
+        self.tracer = tracer
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        tracer = self.tracer
+        for elem in self.data:
+            index = len(tracer.tasks)
+            now = time.perf_counter()
+            tracer.tasks.append(
+                {
+                    "round": tracer.round,
+                    "timed": tracer.timed,
+                    "enqueue": tracer.enqueued or now,
+                    "dispatch": now,
+                }
+            )
+            yield index, elem
+
+
+class Tracer:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.round = -1
+        self.timed = False
+        self.enqueued = None
+        self.tasks = []
+
+    def wrap(self, func):
+        return TracedTask(func)
+
+    def start_round(self, data, timed=True):
+        """
+        Start recording a new round. `data` is a list of inputs for `map`, or
+        an iterable in streaming mode. Untimed (warmup) rounds are included in
+        the timeline but not in the latency statistics.
+        """
+        self.round += 1
+        self.timed = timed
+        if hasattr(data, "__len__"):
+            self.enqueued = time.perf_counter()
+        else:
+            self.enqueued = None
+        return TracedInputs(self, data)
+
+    def record(self, result):
+        value, (index, pid, tid, start, finish) = result
+        self.tasks[index].update(
+            {
+                "pid": pid,
+                "tid": tid,
+                "start": start,
+                "finish": finish,
+                "receipt": time.perf_counter(),
+            }
+        )
+        return value
+
+    def receive(self, results):
+        return [self.record(x) for x in results]
+
+    def stream(self, results):
+        for x in results:
+            yield self.record(x)
+
+    def latencies(self):
+        """
+        Returns lists of latencies (in seconds) for each phase of the tasks.
+        """
+        phases = {"queue": [], "run": [], "return": [], "total": []}
+        for task in self.tasks:
+            if "finish" not in task or not task["timed"]:
+                continue
+            phases["queue"].append(task["start"] - task["dispatch"])
+            phases["run"].append(task["finish"] - task["start"])
+            phases["return"].append(task["receipt"] - task["finish"])
+            phases["total"].append(task["receipt"] - task["enqueue"])
+        return phases
+
+    def histograms(self, nbins=20):
+        histograms = {}
+        for phase, values in self.latencies().items():
+            if not values:
+                continue
+            low, high = min(values), max(values)
+            width = (high - low) / nbins or 1.0
+            counts = [0] * nbins
+            for value in values:
+                counts[min(int((value - low) / width), nbins - 1)] += 1
+            histograms[phase] = {
+                "edges": [low + width * i for i in range(nbins + 1)],
+                "counts": counts,
+            }
+        return histograms
+
+    def summary(self):
+        summary = {}
+        for phase, values in self.latencies().items():
+            if not values:
+                continue
+            summary[f"latency_{phase}_p50"] = percentile(values, 50)
+            summary[f"latency_{phase}_p99"] = percentile(values, 99)
+            summary[f"latency_{phase}_max"] = max(values)
+        return summary
+
+    def to_chrome_trace(self):
+        """
+        Returns the tasks in Chrome's trace event format, which can be loaded
+        in chrome://tracing or https://ui.perfetto.dev. Each worker is a
+        track showing the tasks it ran, and the time each task spent queued
+        and returning its result are shown as async events on the parent.
+        """
+
+        def us(t):
+            return (t - self.origin) * 1e6
+
+        events = []
+        parent = os.getpid()
+        workers = set()
+        for index, task in enumerate(self.tasks):
+            if "finish" not in task:
+                continue
+            workers.add((task["pid"], task["tid"]))
+            events.append(
+                {
+                    "name": f"task {index}",
+                    "cat": "task",
+                    "ph": "X",
+                    "pid": task["pid"],
+                    "tid": task["tid"],
+                    "ts": us(task["start"]),
+                    "dur": us(task["finish"]) - us(task["start"]),
+                    "args": {"round": task["round"], "timed": task["timed"]},
+                }
+            )
+            for name, begin, end in (
+                ("queued", task["dispatch"], task["start"]),
+                ("returning", task["finish"], task["receipt"]),
+            ):
+                for ph, t in (("b", begin), ("e", end)):
+                    events.append(
+                        {
+                            "name": name,
+                            "cat": name,
+                            "ph": ph,
+                            "id": index,
+                            "pid": parent,
+                            "tid": 0,
+                            "ts": us(t),
+                        }
+                    )
+        for i, (pid, tid) in enumerate(sorted(workers)):
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": f"worker {i}"},
+                }
+            )
+        return events
+
+    def write(self, filename):
+        tasks = [
+            {
+                key: (val - self.origin if isinstance(val, float) else val)
+                for key, val in task.items()
+            }
+            for task in self.tasks
+        ]
+        with open(filename, "w") as fd:
+            json.dump(
+                {
+                    "traceEvents": self.to_chrome_trace(),
+                    "displayTimeUnit": "ms",
+                    "tasks": tasks,
+                    "histograms": self.histograms(),
+                },
+                fd,
+            )
@@ -0,0 +1,218 @@
+"""
+Ways of getting task results from the workers back to the parent.
+
+The default `pickle` transport leaves results alone, so they are pickled
+through the pool's result pipe (or not at all for thread pools).
+
+The `shm` transport has the workers write large results into
+`multiprocessing.shared_memory` segments and send back only a small handle.
+Buffer-like results (`bytes`, `bytearray`, `array.array`) are copied into
+shared memory as-is and mapped by the parent as a `memoryview` without
+another copy. Anything else is pickled with protocol 5, and its out-of-band
+buffers (e.g. NumPy arrays) are shared the same way. Large pickles without
+out-of-band buffers are themselves written into shared memory, so they at
+least skip the result pipe.
+
+The segments are named with a prefix chosen by the parent, so that if a
+round fails, the receiver can find and unlink the ones it never received.
+"""
+
+import array
+from multiprocessing import resource_tracker, shared_memory
+import os
+import pickle
+import secrets
+
+# Where POSIX shared memory segments are listed, on Linux
+SHM_DIR = "/dev/shm"
+
+
+# Results smaller than this aren't worth a shared memory segment
+MIN_SHARED_SIZE = 1 << 16
+
+
+class SharedBuffer:
+    """A handle to a buffer that a worker wrote into shared memory."""
+
+    def __init__(self, name, nbytes, format):
+        self.name = name
+        self.nbytes = nbytes
+        self.format = format
+
+
+class SharedPickle:
+    """
+    A handle to a protocol 5 pickle. `data` and each of `buffers` is either
+    `bytes` or a `SharedBuffer`.
+    """
+
+    def __init__(self, data, buffers):
+        self.data = data
+        self.buffers = buffers
+
+
+def segment_prefix():
+    """The prefix of the names of the segments sent to this process."""
+    return f"pool_{os.getpid()}_"
+
+
+def create_untracked(size, prefix):
+    # The parent takes ownership of the segment and unlinks it once it is
+    # mapped, so the worker's resource tracker (which, e.g. in forked workers
+    # or subinterpreters, may not be the parent's) must not clean it up.
+    name = prefix + secrets.token_hex(8)
+    try:
+        return shared_memory.SharedMemory(name, create=True, size=size, track=False)
+    except TypeError:
+        # Python < 3.13
+        shm = shared_memory.SharedMemory(name, create=True, size=size)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def share_buffer(view, prefix):
+    shm = create_untracked(max(view.nbytes, 1), prefix)
+    shm.buf[: view.nbytes] = view.cast("B")
+    shm.close()
+    return SharedBuffer(shm.name, view.nbytes, view.format)
+
+
+def share_result(result, prefix, min_size=MIN_SHARED_SIZE):
+    if isinstance(result, (bytes, bytearray, array.array)):
+        view = memoryview(result)
+        if view.nbytes < min_size:
+            return result
+        return share_buffer(view, prefix)
+
+    buffers = []
+    data = pickle.dumps(result, protocol=5, buffer_callback=buffers.append)
+    if not buffers and len(data) < min_size:
+        return result
+
+    shared = []
+    for buffer in buffers:
+        view = buffer.raw()
+        if view.nbytes < min_size:
+            shared.append(view.tobytes())
+        else:
+            shared.append(share_buffer(view, prefix))
+    if len(data) >= min_size:
+        data = share_buffer(memoryview(data), prefix)
+    return SharedPickle(data, shared)
+
+
+class SharedMemoryResult:
+    """Wraps a task function so its result is returned through shared memory."""
+
+    def __init__(self, func):
+        self.func = func
+        # Created in the parent, so this names the segments after it
+        self.prefix = segment_prefix()
+
+    def __call__(self, arg):
+        return share_result(self.func(arg), self.prefix)
+
+
+class SharedMemoryReceiver:
+    """
+    Maps results returned by `SharedMemoryResult` in the parent. The segments
+    are unlinked as soon as they are mapped, and unmapped when the receiver is
+    closed, so all references to the results must be dropped by then. On
+    exit, the segments that were never received (e.g. the results of the
+    other tasks of a failed `map`) are unlinked too.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self.views = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        self.unlink_unreceived()
+
+    def unlink_unreceived(self):
+        if not os.path.isdir(SHM_DIR):
+            return
+        prefix = segment_prefix()
+        for name in os.listdir(SHM_DIR):
+            if name.startswith(prefix):
+                try:
+                    os.unlink(os.path.join(SHM_DIR, name))
+                except FileNotFoundError:
+                    pass
+
+    def close(self):
+        for view in self.views:
+            view.release()
+        self.views = []
+        for shm in self.segments:
+            shm.close()
+        self.segments = []
+
+    def map_buffer(self, handle):
+        if not isinstance(handle, SharedBuffer):
+            return handle
+        shm = shared_memory.SharedMemory(name=handle.name)
+        # The mapping stays valid after unlinking, and this way nothing
+        # leaks if the receiver is never closed.
+        shm.unlink()
+        self.segments.append(shm)
+        view = shm.buf[: handle.nbytes].cast(handle.format)
+        self.views.append(view)
+        return view
+
+    def receive(self, result):
+        if isinstance(result, SharedBuffer):
+            return self.map_buffer(result)
+        elif isinstance(result, SharedPickle):
+            return pickle.loads(
+                self.map_buffer(result.data),
+                buffers=[self.map_buffer(x) for x in result.buffers],
+            )
+        return result
+
+    def __call__(self, results):
+        return [self.receive(x) for x in results]
+
+    def stream(self, results):
+        # Each result is unmapped as soon as the consumer moves on to the
+        # next one, so memory doesn't grow with the number of results.
+        for x in results:
+            yield self.receive(x)
+            self.close()
+
+
+class PickleReceiver:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def __call__(self, results):
+        return results
+
+    def stream(self, results):
+        return results
+
+
+class PickleTransport:
+    receiver = PickleReceiver
+
+    @staticmethod
+    def wrap(func):
+        return func
+
+
+class SharedMemoryTransport:
+    receiver = SharedMemoryReceiver
+
+    @staticmethod
+    def wrap(func):
+        return SharedMemoryResult(func)
+
+
+TRANSPORTS = {"pickle": PickleTransport, "shm": SharedMemoryTransport}